@@ -0,0 +1,342 @@
+"""In-process stand-in for the slice of the Motor API that ``database.py`` uses.
+
+Documents live in plain lists; every operation optionally sleeps for
+``latency`` seconds first so benchmarks can model a network round trip.
+Only the query/update operators the bot actually issues are supported.
+"""
+
+import asyncio
+import copy
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _set(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _match_value(value, condition):
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$ne" and value == operand:
+                return False
+            if op == "$in" and value not in operand:
+                return False
+            if op == "$exists" and (value is not None) != bool(operand):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+        return True
+    return value == condition
+
+
+def matches(doc, query):
+    return all(_match_value(_get(doc, key), condition) for key, condition in query.items())
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    if all(isinstance(value, dict) for value in projection.values()):
+        # Only {"field": {"$slice": n}}: every field, arrays trimmed
+        result = copy.deepcopy(doc)
+        for key, spec in projection.items():
+            if isinstance(result.get(key), list):
+                count = spec["$slice"]
+                result[key] = result[key][count:] if count < 0 else result[key][:count]
+        return result
+    include = {key for key, flag in projection.items() if flag}
+    result = {key: copy.deepcopy(doc[key]) for key in include if key in doc}
+    if projection.get("_id", 1) and "_id" in doc:
+        result["_id"] = doc["_id"]
+    return result
+
+
+def _apply_update(doc, update, inserting):
+    for path, value in update.get("$set", {}).items():
+        _set(doc, path, copy.deepcopy(value))
+    if inserting:
+        for path, value in update.get("$setOnInsert", {}).items():
+            _set(doc, path, copy.deepcopy(value))
+    for path, amount in update.get("$inc", {}).items():
+        _set(doc, path, (_get(doc, path) or 0) + amount)
+    for path, value in update.get("$min", {}).items():
+        if _get(doc, path) is None or value < _get(doc, path):
+            _set(doc, path, copy.deepcopy(value))
+    for path, value in update.get("$max", {}).items():
+        if _get(doc, path) is None or value > _get(doc, path):
+            _set(doc, path, copy.deepcopy(value))
+    for path, value in update.get("$push", {}).items():
+        items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+        items = (_get(doc, path) or []) + copy.deepcopy(items)
+        if isinstance(value, dict) and "$sort" in value:
+            items = _sorted(items, list(value["$sort"].items()))
+        _set(doc, path, items)
+    for path in update.get("$unset", {}):
+        parts = path.split(".")
+        parent = _get(doc, ".".join(parts[:-1])) if len(parts) > 1 else doc
+        if isinstance(parent, dict):
+            parent.pop(parts[-1], None)
+
+
+def _sorted(docs, spec):
+    """Multi-key sort; None sorts first, like MongoDB's null ordering"""
+    spec = [(spec, 1)] if isinstance(spec, str) else list(spec)
+    for field, direction in reversed(spec):
+        docs = sorted(
+            docs,
+            key=lambda doc: (_get(doc, field) is not None, _get(doc, field)),
+            reverse=direction < 0
+        )
+    return docs
+
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = [(key, direction or 1)] if isinstance(key, str) else key
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def _results(self):
+        docs = [doc for doc in self.collection.docs if matches(doc, self.query)]
+        if self._sort:
+            docs = _sorted(docs, self._sort)
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self.projection) for doc in docs]
+
+    async def to_list(self, length=None):
+        await self.collection._delay()
+        docs = self._results()
+        return docs if length is None else docs[:length]
+
+    async def __aiter__(self):
+        await self.collection._delay()
+        for doc in self._results():
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, name, latency):
+        self.name = name
+        self.latency = latency
+        self.docs = []
+        self.ops = 0
+
+    async def _delay(self):
+        self.ops += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _first(self, query, sort=None):
+        docs = [doc for doc in self.docs if matches(doc, query)]
+        if sort:
+            docs = _sorted(docs, sort)
+        return docs[0] if docs else None
+
+    async def create_index(self, keys, **kwargs):
+        return kwargs.get("name", "index")
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        await self._delay()
+        doc = self._first(query or {}, sort)
+        return _project(doc, projection) if doc is not None else None
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, query or {}, projection)
+
+    async def count_documents(self, query):
+        await self._delay()
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def insert_one(self, doc):
+        await self._delay()
+        doc.setdefault("_id", ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        await self._delay()
+        ids = {doc["_id"] for doc in self.docs}
+        errors = []
+        for index, doc in enumerate(docs):
+            doc.setdefault("_id", ObjectId())
+            if doc["_id"] in ids:
+                # Same shape as pymongo reports a duplicate _id
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+                continue
+            ids.add(doc["_id"])
+            self.docs.append(copy.deepcopy(doc))
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    def _update(self, query, update, upsert):
+        doc = self._first(query)
+        if doc is not None:
+            _apply_update(doc, update, inserting=False)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if not upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+        doc = {key: value for key, value in query.items() if not isinstance(value, dict)}
+        doc.setdefault("_id", ObjectId())
+        _apply_update(doc, update, inserting=True)
+        self.docs.append(doc)
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+
+    async def delete_one(self, query):
+        await self._delay()
+        doc = self._first(query)
+        if doc is not None:
+            self.docs.remove(doc)
+        return SimpleNamespace(deleted_count=int(doc is not None))
+
+    async def delete_many(self, query):
+        await self._delay()
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not matches(doc, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def update_one(self, query, update, upsert=False):
+        await self._delay()
+        return self._update(query, update, upsert)
+
+    async def replace_one(self, query, replacement, upsert=False):
+        await self._delay()
+        doc = self._first(query)
+        if doc is not None:
+            _id = doc["_id"]
+            doc.clear()
+            doc.update(copy.deepcopy(replacement), _id=_id)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = dict(copy.deepcopy(replacement), **{k: v for k, v in query.items() if not isinstance(v, dict)})
+            doc.setdefault("_id", ObjectId())
+            self.docs.append(doc)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=doc["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE):
+        await self._delay()
+        doc = self._first(query)
+        before = copy.deepcopy(doc) if doc is not None else None
+        result = self._update(query, update, upsert)
+        if return_document == ReturnDocument.AFTER:
+            if doc is None and result.upserted_id is not None:
+                doc = self._first({"_id": result.upserted_id})
+            return _project(doc, projection) if doc is not None else None
+        return _project(before, projection) if before is not None else None
+
+    async def bulk_write(self, requests, ordered=True):
+        await self._delay()
+        modified = 0
+        for request in requests:
+            # pymongo.UpdateOne keeps its arguments in private slots
+            result = self._update(request._filter, request._doc, request._upsert)
+            modified += result.modified_count
+        return SimpleNamespace(modified_count=modified)
+
+    async def _aggregate(self, pipeline):
+        await self._delay()
+        (stage,) = pipeline
+        spec = stage["$group"]
+        key_path = spec["_id"].lstrip("$")
+        groups = {}
+        for doc in self.docs:
+            key = _get(doc, key_path)
+            group = groups.setdefault(key, {"_id": key})
+            for field, accumulator in spec.items():
+                if field == "_id":
+                    continue
+                group[field] = group.get(field, 0) + _evaluate(doc, accumulator["$sum"])
+        for group in groups.values():
+            yield group
+
+    def aggregate(self, pipeline):
+        """Only a single ``$group`` stage with ``$sum`` accumulators"""
+        return self._aggregate(pipeline)
+
+
+def _evaluate(doc, expression):
+    if isinstance(expression, dict) and "$cond" in expression:
+        condition, then, otherwise = expression["$cond"]
+        left, right = condition["$eq"]
+        left = _get(doc, left.lstrip("$")) if isinstance(left, str) and left.startswith("$") else left
+        return then if left == right else otherwise
+    return expression
+
+
+class FakeDatabase:
+    def __init__(self, latency):
+        self.latency = latency
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, self.latency)
+        return self.collections[name]
+
+    async def command(self, name, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """Drop-in for ``AsyncIOMotorClient`` in benchmarks (``db.client``)"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.databases = {}
+        self.admin = FakeDatabase(0.0)
+
+    def __getitem__(self, name):
+        if name not in self.databases:
+            self.databases[name] = FakeDatabase(self.latency)
+        return self.databases[name]
+
+    def operations(self):
+        return {
+            f"{name}": collection.ops
+            for database in self.databases.values()
+            for name, collection in database.collections.items()
+        }
+
+    def close(self):
+        pass
@@ -0,0 +1,91 @@
+"""Telegram side of the benchmark: a Client stand-in plus real Pyrogram updates.
+
+Handlers receive genuine ``pyrogram.types.Message`` / ``CallbackQuery``
+objects bound to ``FakeTelegram``, so ``message.reply()``, ``react()`` and
+``edit_text()`` run Pyrogram's own code and land here instead of on the
+network. Every outgoing call sleeps ``latency`` seconds (Bot API round
+trip) and is recorded per chat.
+"""
+
+import asyncio
+import itertools
+import time
+from datetime import datetime
+from pyrogram import enums
+from pyrogram.types import Message, CallbackQuery, User, Chat
+
+
+class FakeTelegram:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._ids = itertools.count(1)
+        self.me = User(id=999999, is_bot=True, first_name="Bench Bot")
+        self.sent = {}  # chat_id -> [(monotonic time, text, edited)]
+        self.calls = {}
+
+    async def _call(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _message(self, chat_id, text, from_user):
+        return Message(
+            client=self,
+            id=next(self._ids),
+            from_user=from_user,
+            chat=Chat(id=chat_id, type=enums.ChatType.PRIVATE, client=self),
+            date=datetime.now(),
+            text=text
+        )
+
+    # ---- incoming updates ----
+
+    def user(self, user_id):
+        return User(id=user_id, is_bot=False, first_name=f"User{user_id}", username=f"bench{user_id}")
+
+    def incoming(self, user, text):
+        message = self._message(user.id, text, user)
+        if text.startswith("/"):
+            message.command = text[1:].split()
+        return message
+
+    def callback(self, user, data, message):
+        return CallbackQuery(
+            client=self,
+            id=str(next(self._ids)),
+            from_user=user,
+            chat_instance="bench",
+            message=message,
+            data=data
+        )
+
+    # ---- Client methods the handlers reach ----
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        self.sent.setdefault(chat_id, []).append((time.monotonic(), text, False))
+        return self._message(chat_id, text, self.me)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call("edit_message_text")
+        self.sent.setdefault(chat_id, []).append((time.monotonic(), text, True))
+        return self._message(chat_id, text, self.me)
+
+    async def send_reaction(self, **kwargs):
+        await self._call("send_reaction")
+        return True
+
+    async def send_chat_action(self, chat_id, action):
+        await self._call("send_chat_action")
+        return True
+
+    async def answer_callback_query(self, **kwargs):
+        await self._call("answer_callback_query")
+        return True
+
+    def first_reply_after(self, chat_id, started):
+        """Time of the first outgoing message to ``chat_id`` at or after ``started``"""
+        for sent_at, _, _ in self.sent.get(chat_id, []):
+            if sent_at >= started:
+                return sent_at
+        return None
@@ -0,0 +1,131 @@
+"""Local aiohttp stand-in for the Cohere and Hugging Face HTTP APIs.
+
+Serves ``POST /v1/generate`` (plain and NDJSON streaming) and
+``POST /models/{model}`` with latency, 5xx, 429 and 503 (model loading)
+behaviour taken from a profile. Point the bot at it with
+``COHERE_BASE_URL`` / ``HF_BASE_URL``.
+"""
+
+import asyncio
+import json
+import random
+from aiohttp import web
+
+REPLY = "Haan yaar, main yahin hoon! Batao aaj ka din kaisa raha? 😊"
+
+# Per provider: mean latency and jitter (s), and the share of requests
+# answered with 500, 429 (rate limited) or 503 (model loading, HF only)
+PROFILES = {
+    "fast": {
+        "cohere": {"latency": 0.05, "jitter": 0.02},
+        "hf": {"latency": 0.1, "jitter": 0.05}
+    },
+    "default": {
+        "cohere": {"latency": 0.8, "jitter": 0.4, "error_rate": 0.01},
+        "hf": {"latency": 1.5, "jitter": 1.0, "error_rate": 0.02, "loading_rate": 0.02}
+    },
+    "slow": {
+        "cohere": {"latency": 4.0, "jitter": 3.0},
+        "hf": {"latency": 6.0, "jitter": 4.0}
+    },
+    "flaky": {
+        "cohere": {"latency": 1.0, "jitter": 0.8, "error_rate": 0.2},
+        "hf": {"latency": 2.0, "jitter": 1.5, "error_rate": 0.2, "loading_rate": 0.1}
+    },
+    "throttled": {
+        "cohere": {"latency": 0.8, "jitter": 0.4, "rate_limit_rate": 0.3, "retry_after": 5},
+        "hf": {"latency": 1.5, "jitter": 1.0, "rate_limit_rate": 0.3}
+    },
+    "cohere_down": {
+        "cohere": {"latency": 0.2, "jitter": 0.1, "error_rate": 1.0},
+        "hf": {"latency": 1.5, "jitter": 1.0, "loading_rate": 0.05}
+    }
+}
+
+
+class ProviderStub:
+    def __init__(self, profile):
+        self.profile = profile
+        self.calls = {"cohere": 0, "hf": 0}
+        self.statuses = {}
+        self.runner = None
+        self.port = None
+
+    def _outcome(self, provider):
+        """(status, delay) for one request under the profile"""
+        spec = self.profile.get(provider, {})
+        delay = max(0.0, random.gauss(spec.get("latency", 0.1), spec.get("jitter", 0.0)))
+        roll = random.random()
+        for status, key in ((500, "error_rate"), (429, "rate_limit_rate"), (503, "loading_rate")):
+            share = spec.get(key, 0.0)
+            if roll < share:
+                return status, delay
+            roll -= share
+        return 200, delay
+
+    def _count(self, provider, status):
+        self.calls[provider] += 1
+        key = f"{provider}:{status}"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    async def cohere_generate(self, request):
+        payload = await request.json()
+        status, delay = self._outcome("cohere")
+        self._count("cohere", status)
+
+        if status == 429:
+            await asyncio.sleep(delay / 4)
+            retry_after = str(self.profile["cohere"].get("retry_after", 2))
+            return web.json_response({"message": "rate limited"}, status=429, headers={"Retry-After": retry_after})
+        if status != 200:
+            await asyncio.sleep(delay)
+            return web.json_response({"message": "internal error"}, status=status)
+
+        if not payload.get("stream"):
+            await asyncio.sleep(delay)
+            return web.json_response({"generations": [{"text": f" {REPLY}"}]})
+
+        # First chunk after a third of the latency, the rest spread over the remainder
+        response = web.StreamResponse(headers={"Content-Type": "application/stream+json"})
+        await response.prepare(request)
+        words = REPLY.split(" ")
+        await asyncio.sleep(delay / 3)
+        for i, word in enumerate(words):
+            chunk = {"text": (" " if i else "") + word, "is_finished": False}
+            await response.write(json.dumps(chunk).encode() + b"\n")
+            await asyncio.sleep(delay * 2 / 3 / len(words))
+        await response.write(json.dumps({"is_finished": True}).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    async def hf_model(self, request):
+        await request.read()
+        status, delay = self._outcome("hf")
+        self._count("hf", status)
+
+        if status == 503:
+            await asyncio.sleep(delay / 4)
+            return web.json_response({"error": "loading", "estimated_time": 20.0}, status=503)
+        await asyncio.sleep(delay)
+        if status == 429:
+            return web.json_response({"error": "rate limited"}, status=429)
+        if status != 200:
+            return web.json_response({"error": "internal error"}, status=status)
+        return web.json_response([{"generated_text": REPLY}])
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_post("/v1/generate", self.cohere_generate)
+        app.router.add_post("/models/{model:.+}", self.hf_model)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
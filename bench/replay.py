@@ -0,0 +1,165 @@
+"""Export recorded conversations and replay them against the bot.
+
+    python -m bench.replay export --since 2026-10-01 --until 2026-10-02 --out traffic.jsonl.gz
+    python -m bench.replay run traffic.jsonl.gz --speed 10 --profile default --name replay10x
+
+``export`` reads conversation turns from ``MONGO_URI`` (documents or
+buckets, per ``CONVERSATION_STORAGE``) and writes gzipped JSON lines in
+timestamp order: a header, then one ``{"u", "t", "m"}`` record per user
+message (pseudonymous user number, seconds since the first message,
+text). ``--redact`` replaces texts with stable tokens of
+the same length, so repeats (and response cache behaviour) survive.
+
+``run`` replays the file through ``bench.run.Bench`` at ``--speed`` times
+the original arrival rate, in recorded order, so every user's messages
+keep their order and (scaled) gaps. A message the coalescer absorbs
+counts as done when the reply to its batch is; ``absorbed`` reports
+those separately.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import random
+import time
+from datetime import datetime
+
+from bench.run import Bench, add_common_arguments, save_result
+
+FORMAT_VERSION = 1
+
+
+def _redact(text):
+    if not text:
+        return text
+    digest = hashlib.blake2b(text.encode(), digest_size=6).hexdigest()
+    return (digest * (len(text) // len(digest) + 1))[:len(text)]
+
+
+async def export(args):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from config import Config
+    from conversation_store import create_store
+
+    client = AsyncIOMotorClient(Config.MONGO_URI)
+    store = create_store(client[Config.DATABASE_NAME])
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    turns = [
+        (turn["timestamp"], turn["user_id"], turn.get("user_message") or "")
+        async for turn in store.iter_turns(since, until)
+    ]
+    client.close()
+    turns.sort(key=lambda turn: turn[0])
+    if args.limit:
+        turns = turns[:args.limit]
+
+    users = {}
+    records = []
+    first = turns[0][0] if turns else None
+    for timestamp, user_id, text in turns:
+        records.append({
+            "u": users.setdefault(user_id, len(users)),
+            "t": round((timestamp - first).total_seconds(), 3),
+            "m": _redact(text) if args.redact else text
+        })
+
+    header = {
+        "v": FORMAT_VERSION,
+        "exported": datetime.now().isoformat(timespec="seconds"),
+        "start": first.isoformat() if first else None,
+        "users": len(users),
+        "messages": len(records),
+        "redacted": args.redact
+    }
+    with gzip.open(args.out, "wt", encoding="utf-8") as f:
+        f.write(json.dumps(header) + "\n")
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    span = records[-1]["t"] if records else 0
+    print(f"💾 {len(records)} messages from {len(users)} users over {span / 60:.1f} min → {args.out}")
+
+
+def load(path):
+    """(header, records in arrival order)"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("v") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported traffic file version: {header.get('v')}")
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda record: record["t"])
+    return header, records
+
+
+async def replay(args):
+    header, records = load(args.file)
+    if args.limit:
+        records = records[:args.limit]
+
+    bench = Bench(args)
+    await bench.start()
+
+    users = {number: bench.telegram.user(100000 + number) for number in {record["u"] for record in records}}
+    await asyncio.gather(*(bench.onboard(user) for user in users.values()))
+    bench.begin()
+
+    # One scheduling loop in recorded order keeps each user's messages in sequence
+    started = time.monotonic()
+    pending = []
+    lag = 0.0
+    for record in records:
+        due = started + record["t"] / args.speed
+        wait = due - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        else:
+            lag = max(lag, -wait)
+        pending.append(asyncio.ensure_future(bench.send(users[record["u"]], record["m"])))
+    await asyncio.gather(*pending)
+
+    result = bench.result()
+    result["replay"] = {
+        "file": args.file,
+        "speed": args.speed,
+        "recorded_users": header.get("users"),
+        "recorded_messages": header.get("messages"),
+        "recorded_span": records[-1]["t"] if records else 0,
+        "max_schedule_lag": round(lag, 3)
+    }
+    await bench.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and replay recorded conversation traffic")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="dump conversations from MONGO_URI to a .jsonl.gz file")
+    export_parser.add_argument("--since", help="ISO date/time (inclusive)")
+    export_parser.add_argument("--until", help="ISO date/time (exclusive)")
+    export_parser.add_argument("--limit", type=int, default=0, help="at most this many messages")
+    export_parser.add_argument("--redact", action="store_true", help="replace texts with same-length tokens")
+    export_parser.add_argument("--out", default="traffic.jsonl.gz")
+
+    run_parser = commands.add_parser("run", help="replay a traffic file against the bot")
+    run_parser.add_argument("file")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="arrival rate multiplier (1, 10, 100...)")
+    run_parser.add_argument("--limit", type=int, default=0, help="replay only the first N messages")
+    add_common_arguments(run_parser)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        asyncio.run(export(args))
+        return
+
+    random.seed(args.seed)
+    args.name = args.name or f"replay-{args.speed:g}x-{datetime.now():%Y%m%d-%H%M%S}"
+    save_result(args, asyncio.run(replay(args)))
+
+
+if __name__ == "__main__":
+    main()
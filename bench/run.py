@@ -0,0 +1,430 @@
+"""Offline load test of the real conversation handlers.
+
+    python -m bench.run --users 200 --messages 5 --profile default
+    python -m bench.run --rate 50 --duration 30 --name rate50
+    python -m bench.run --compare bench/results/before.json bench/results/after.json
+
+Recorded traffic can be replayed with ``bench.replay``.
+
+Simulated users run /start, pick a gender and then chat. Updates go
+through a Pyrogram-like worker pool (``bot.workers`` tasks) into
+``handle_conversation`` and the per-user mailboxes; Cohere/HF are served by ``provider_stub`` and
+MongoDB by ``fake_mongo``. By default each user waits for a reply and a
+random think time before the next message (closed loop); ``--rate``
+instead sends messages at a fixed overall rate (open loop).
+A message's latency runs until the reply to the batch it was answered in
+is done, so messages the coalescer absorbs are not counted as instant.
+
+Results (throughput, latency percentiles, provider calls per message...)
+are written as JSON to ``bench/results/<name>.json`` for ``--compare``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from bench.fake_mongo import FakeMongoClient
+from bench.fake_telegram import FakeTelegram
+from bench.provider_stub import PROFILES, ProviderStub
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+MESSAGES = [
+    "hi", "kaise ho?", "aaj office mein bahut kaam tha", "tum kya kar rahe ho",
+    "mujhe neend nahi aa rahi", "ek joke sunao", "good morning", "I miss you",
+    "weekend pe movie dekhne chalein?", "mera din bahut bura gaya yaar",
+    "tumhara favourite gaana kaunsa hai", "ok", "haha", "acha sunao na kuch",
+    "kal exam hai, thoda darr lag raha hai"
+]
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))], 4)
+
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(values[-1], 4)
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class Dispatcher:
+    """Handler worker pool shaped like Pyrogram's (one queue, N workers)"""
+
+    def __init__(self, workers):
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.ensure_future(self._worker()) for _ in range(workers)]
+
+    async def _worker(self):
+        while True:
+            handler, args, done = await self.queue.get()
+            result = None
+            try:
+                result = await handler(*args)
+            except Exception as e:
+                print(f"❌ Handler error: {e!r}", file=sys.stderr)
+            finally:
+                done.set_result(result)
+
+    def dispatch(self, handler, *args):
+        done = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((handler, args, done))
+        return done
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+
+
+class Bench:
+    """The bot wired to the stand-ins, plus what a run measures"""
+
+    def __init__(self, args):
+        self.args = args
+        self.latencies = []
+        self.first_replies = []
+        # Messages the coalescer folded into a running turn (also in ``latencies``)
+        self.absorbed = []
+        # user_id -> the user's latest mailbox turn
+        self.turns = {}
+        # message id -> future set, with its first reply's time, once its batch is answered
+        self.answered = {}
+        self.started = None
+
+    async def start(self):
+        args = self.args
+        profile = dict(PROFILES[args.profile])
+        if args.provider_latency is not None:
+            profile = {name: dict(spec, latency=args.provider_latency) for name, spec in profile.items()}
+
+        self.stub = ProviderStub(profile)
+        base_url = await self.stub.start()
+
+        # Config reads the environment at import time, so set it up before the bot loads
+        os.environ.update({
+            "COHERE_API_KEY": "bench",
+            "HUGGINGFACE_API_KEY": "bench",
+            "COHERE_BASE_URL": base_url,
+            "HF_BASE_URL": base_url,
+            "MONGO_URI": "mongodb://bench",
+            "LOG_CHANNEL": "0",
+            "FORCE_SUB_CHANNEL": ""
+        })
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        for item in args.env:
+            key, value = item.split("=", 1)
+            os.environ[key] = value
+
+        import bot
+        from config import Config
+        from database import db
+        from http_client import http_client
+        from log_config import setup_logging
+        from mailboxes import mailboxes
+        from ratelimit import user_limiter
+        from scheduler import ai_scheduler
+
+        self.bot = bot
+        setup_logging()
+        self.mongo = FakeMongoClient(latency=args.mongo_latency)
+        await db.connect(client=self.mongo)
+        await http_client.start()
+        ai_scheduler.start()
+        mailboxes.start()
+        user_limiter.start(Config.RATE_LIMIT_SWEEP_INTERVAL)
+
+        self.telegram = FakeTelegram(latency=args.telegram_latency)
+        self.dispatcher = Dispatcher(args.workers or bot.bot.workers)
+
+        # A coalesced message is done when the reply to its batch is, not when
+        # its handler returns or when the whole (possibly multi-batch) turn ends
+        reply_to_messages = bot.reply_to_messages
+
+        async def reply_and_record(client, batch):
+            started = time.monotonic()
+            try:
+                await reply_to_messages(client, batch)
+            finally:
+                first = self.telegram.first_reply_after(batch[-1].from_user.id, started)
+                for message in batch:
+                    answered = self.answered.pop(message.id, None)
+                    if answered is not None and not answered.done():
+                        answered.set_result(first)
+
+        bot.reply_to_messages = reply_and_record
+
+    async def onboard(self, user):
+        """/start, then the gender button (not part of the measurement)"""
+        bot, telegram = self.bot, self.telegram
+        await self.dispatcher.dispatch(bot.start_command, telegram, telegram.incoming(user, "/start"))
+        prompt = telegram._message(user.id, "gender?", telegram.me)
+        gender = random.choice(["male", "female"])
+        await self.dispatcher.dispatch(bot.gender_selection, telegram, telegram.callback(user, f"gender_{gender}", prompt))
+
+    def begin(self):
+        """Start measuring: stand-in counters are reset so setup traffic is excluded"""
+        self.calls_before = dict(self.stub.calls)
+        self.mongo_before = self.mongo.operations()
+        self.started = time.monotonic()
+
+    async def _handle(self, client, message):
+        """``handle_conversation``, plus the turn that will answer the message"""
+        user_id = message.from_user.id
+        # Read before the handler runs: absorbing happens before its first await
+        running = self.turns.get(user_id)
+        turn = await self.bot.handle_conversation(client, message)
+        if turn is not None:
+            self.turns[user_id] = turn
+            return turn, False
+        # Absorbed: answered by the running turn's follow-up batch
+        return running, running is not None
+
+    async def send(self, user, text):
+        """Dispatch one chat message and wait until the reply to its batch is done"""
+        started = time.monotonic()
+        message = self.telegram.incoming(user, text)
+        answered = self.answered[message.id] = asyncio.get_running_loop().create_future()
+        done = self.dispatcher.dispatch(self._handle, self.telegram, message)
+        turn, absorbed = await done or (None, False)
+        if turn is not None:
+            # A turn can end without replying (banned, not subscribed...)
+            await asyncio.wait([answered, turn], return_when=asyncio.FIRST_COMPLETED)
+        self.answered.pop(message.id, None)
+        finished = time.monotonic()
+        self.latencies.append(finished - started)
+        if absorbed:
+            self.absorbed.append(finished - started)
+        first = answered.result() if answered.done() else None
+        if first is not None and started <= first <= finished:
+            self.first_replies.append(first - started)
+
+    def result(self):
+        from database import db
+        from helpers import get_ai_stats
+        from mailboxes import mailboxes
+        from metrics import summary as metrics_summary
+        from response_cache import response_cache
+        from scheduler import ai_scheduler
+
+        bot, args = self.bot, self.args
+        elapsed = time.monotonic() - self.started
+
+        # Outgoing messages by kind (streaming edits of a reply don't count again)
+        outcomes = {"reply": 0, "throttled": 0, "busy": 0}
+        for messages in self.telegram.sent.values():
+            for sent_at, text, edited in messages:
+                if sent_at < self.started or edited:
+                    continue
+                if text == "⏳ Wait!":
+                    outcomes["throttled"] += 1
+                elif text == bot.BUSY_REPLY:
+                    outcomes["busy"] += 1
+                else:
+                    outcomes["reply"] += 1
+
+        sent = len(self.latencies)
+        provider_calls = {name: self.stub.calls[name] - self.calls_before.get(name, 0) for name in self.stub.calls}
+        mongo_ops = {
+            name: count - self.mongo_before.get(name, 0)
+            for name, count in self.mongo.operations().items()
+        }
+        stages = {
+            labels["stage"]: {"count": count, "p50": round(p50, 4), "p95": round(p95, 4), "mean": round(avg, 4)}
+            for labels, count, p50, p95, avg in metrics_summary("bot_stage_seconds")
+        }
+        return {
+            "name": args.name,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "args": {key: value for key, value in vars(args).items() if key != "compare"},
+            "messages": sent,
+            "duration": round(elapsed, 3),
+            "throughput": round(sent / elapsed, 3) if elapsed else 0.0,
+            "latency": _percentiles(self.latencies),
+            "first_reply": _percentiles(self.first_replies),
+            "absorbed": _percentiles(self.absorbed),
+            "outcomes": outcomes,
+            "coalesced": bot.coalescer.stats["absorbed"],
+            "provider_calls": provider_calls,
+            "provider_statuses": self.stub.statuses,
+            "calls_per_message": round(sum(provider_calls.values()) / sent, 3) if sent else 0.0,
+            "ai": get_ai_stats(),
+            "scheduler": ai_scheduler.stats(),
+            "mailboxes": mailboxes.stats(),
+            "response_cache": response_cache.stats(),
+            "user_cache": db.user_cache.stats(),
+            "history_cache": db.history_cache.stats(),
+            "telegram_calls": self.telegram.calls,
+            "mongo_ops": mongo_ops,
+            "mongo_ops_per_message": round(sum(mongo_ops.values()) / sent, 3) if sent else 0.0,
+            "stages": stages
+        }
+
+    async def stop(self):
+        from database import db
+        from http_client import http_client
+        from log_config import stop_logging
+        from mailboxes import mailboxes
+        from ratelimit import user_limiter
+        from scheduler import ai_scheduler
+
+        self.dispatcher.stop()
+        user_limiter.stop()
+        await mailboxes.stop()
+        await ai_scheduler.stop()
+        await db.close()
+        await http_client.close()
+        await self.stub.stop()
+        stop_logging()
+
+
+async def run(args):
+    bench = Bench(args)
+    await bench.start()
+
+    users = [bench.telegram.user(100000 + i) for i in range(args.users)]
+    await asyncio.gather(*(bench.onboard(user) for user in users))
+    bench.begin()
+
+    if args.rate:
+        # Open loop: arrivals at a fixed overall rate, whatever the bot's speed
+        pending = []
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            pending.append(asyncio.ensure_future(bench.send(random.choice(users), random.choice(MESSAGES))))
+            await asyncio.sleep(random.expovariate(args.rate))
+        await asyncio.gather(*pending)
+    else:
+        # Closed loop: every user waits for the reply, thinks, then writes again
+        async def chat(user):
+            await asyncio.sleep(random.uniform(0, args.think))
+            for _ in range(args.messages):
+                await bench.send(user, random.choice(MESSAGES))
+                await asyncio.sleep(random.expovariate(1 / args.think) if args.think else 0)
+
+        await asyncio.gather(*(chat(user) for user in users))
+
+    result = bench.result()
+    await bench.stop()
+    return result
+
+
+# (label, key path, lower is better)
+COMPARE_METRICS = [
+    ("throughput msg/s", ("throughput",), False),
+    ("latency p50 s", ("latency", "p50"), True),
+    ("latency p95 s", ("latency", "p95"), True),
+    ("latency p99 s", ("latency", "p99"), True),
+    ("first reply p50 s", ("first_reply", "p50"), True),
+    ("first reply p95 s", ("first_reply", "p95"), True),
+    ("absorbed p50 s", ("absorbed", "p50"), True),
+    ("calls/message", ("calls_per_message",), True),
+    ("mongo ops/message", ("mongo_ops_per_message",), True),
+    ("queue wait p95 s", ("scheduler", "p95_wait"), True),
+    ("response cache hits", ("response_cache", "hit_rate"), False),
+    ("history cache hits", ("history_cache", "hit_rate"), False),
+    ("busy replies", ("outcomes", "busy"), True),
+    ("throttled", ("outcomes", "throttled"), True)
+]
+
+
+def _lookup(result, path):
+    for key in path:
+        result = (result or {}).get(key)
+    return result
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"{'metric':<20} {before['name']:>14} {after['name']:>14} {'change':>9}")
+    for label, path, lower_is_better in COMPARE_METRICS:
+        old, new = _lookup(before, path), _lookup(after, path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.1%}" if old else "n/a"
+        better = (new < old) if lower_is_better else (new > old)
+        marker = "" if new == old else (" ✅" if better else " ❌")
+        print(f"{label:<20} {old:>14} {new:>14} {change:>9}{marker}")
+
+
+def add_common_arguments(parser):
+    """Stand-in and output options shared by ``run`` and ``replay``"""
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default", help="provider latency/error profile")
+    parser.add_argument("--provider-latency", type=float, default=None, help="override mean provider latency (s)")
+    parser.add_argument("--mongo-latency", type=float, default=0.002, help="seconds per MongoDB operation")
+    parser.add_argument("--telegram-latency", type=float, default=0.03, help="seconds per Bot API call")
+    parser.add_argument("--workers", type=int, default=0, help="handler workers (default: the bot's Pyrogram workers)")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra Config environment")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--name", default=None, help="result name (default: timestamp)")
+    parser.add_argument("--out", default=None, help="result file (default: bench/results/<name>.json)")
+
+
+def save_result(args, result):
+    """Write the result JSON and print a one-line summary"""
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.name}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2, default=str)
+
+    latency = result["latency"]
+    print(
+        f"📊 {result['messages']} msgs in {result['duration']:.1f}s → {result['throughput']:.1f} msg/s | "
+        f"p50 {latency.get('p50', 0):.2f}s p95 {latency.get('p95', 0):.2f}s p99 {latency.get('p99', 0):.2f}s | "
+        f"{result['absorbed']['count']} absorbed | "
+        f"{result['calls_per_message']:.2f} provider calls/msg | {result['outcomes']}"
+    )
+    print(f"💾 {out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the conversation pipeline")
+    parser.add_argument("--users", type=int, default=100, help="simulated users")
+    parser.add_argument("--messages", type=int, default=5, help="messages per user (closed loop)")
+    parser.add_argument("--think", type=float, default=2.0, help="mean think time between a reply and the next message")
+    parser.add_argument("--rate", type=float, default=0.0, help="open loop: messages per second overall")
+    parser.add_argument("--duration", type=float, default=30.0, help="open loop: seconds to send for")
+    add_common_arguments(parser)
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    random.seed(args.seed)
+    args.name = args.name or datetime.now().strftime("%Y%m%d-%H%M%S")
+    save_result(args, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,54 @@
-import asyncio
-from pyrogram import Client, filters, enums
+import logging
+from pyrogram import Client, filters, enums, idle
 from pyrogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from pyrogram.errors import ReactionInvalid
 from config import Config
 from database import db
+from http_client import http_client
+from broadcast import broadcasts
+from log_channel import log_pipeline
+from memory import schedule_summary
+from prompt import build_messages
+from response_cache import response_cache
 from helpers import (
     check_force_sub,
+    invalidate_force_sub,
+    get_force_sub_stats,
+    get_ai_stats,
+    get_breaker_states,
     get_ai_response,
     get_system_prompt,
     create_gender_keyboard,
     create_mode_keyboard,
     get_random_reaction,
+    StreamingReply,
     send_to_log_channel
 )
-from flask import Flask
-from threading import Thread
-import time
-
-# Flask for Render
-app = Flask(__name__)
-
-@app.route('/')
-def home():
-    return f"✅ {Config.BOT_NAME} is running!"
-
-@app.route('/health')
-def health():
-    return {"status": "healthy", "bot": Config.BOT_NAME}
-
-def run_flask():
-    app.run(host="0.0.0.0", port=Config.PORT)
+from ratelimit import user_limiter, ai_limiter
+from coalesce import coalescer, merge_text
+from mailboxes import mailboxes
+from scheduler import ai_scheduler, SchedulerBusy
+from web import web_server
+from workers import worker_pool
+from metrics import span, summary as metrics_summary
+import log_config
+from log_config import setup_logging, stop_logging
+
+# Named explicitly: __name__ is "__main__" when run as a script
+log = logging.getLogger("bot")
+
+# Set by workers.run_worker in multi-process mode
+worker_index = None
 
 # Pyrogram Bot
 bot = Client(
     "ai_companion_bot",
     api_id=Config.API_ID,
     api_hash=Config.API_HASH,
-    bot_token=Config.BOT_TOKEN
+    bot_token=Config.BOT_TOKEN,
+    workers=Config.PYROGRAM_WORKERS or Client.WORKERS
 )
 
-# Flood control
-user_flood_control = {}
-
 # ========== USER COMMANDS ==========
 
 @bot.on_message(filters.command("start") & filters.private)
@@ -131,6 +138,7 @@ async def gender_selection(client: Client, callback: CallbackQuery):
 
 @bot.on_callback_query(filters.regex("^refresh_sub$"))
 async def refresh_subscription(client: Client, callback: CallbackQuery):
+    invalidate_force_sub(callback.from_user.id)
     is_subscribed, _ = await check_force_sub(client, callback.from_user.id)
     if is_subscribed:
         await callback.message.delete()
@@ -153,11 +161,14 @@ async def help_command(client: Client, message: Message):
 **Admin Commands:**
 /ownerpanel - Control panel
 /broadcast <msg> - Broadcast
-/viewstats - Statistics
+/bcstatus, /bcpause, /bcresume, /bccancel [id] - Manage broadcast
+/viewstats [live] - Statistics
 /banuser <id> - Ban user
 /unbanuser <id> - Unban user
 /debug - System check
-/aitest - Test AI
+/dbcheck - Index & query plan check
+/aitest [fresh] - Test AI
+/latency - Per-stage reply latency
 
 Total Users: {await db.get_total_users()}
 """
@@ -212,6 +223,11 @@ async def mode_selection(client: Client, callback: CallbackQuery):
 
 @bot.on_message(filters.command("reset") & filters.private)
 async def reset_command(client: Client, message: Message):
+    # Behind any turn still being answered, so its save can't undo the reset
+    return mailboxes.post(message.from_user.id, lambda: reset_memory(message))
+
+
+async def reset_memory(message: Message):
     await db.reset_memory(message.from_user.id)
     await message.reply("🔄 **Memory Reset**\nFresh start!")
 
@@ -247,7 +263,7 @@ async def owner_panel(client: Client, message: Message):
 🤖 AI: Hugging Face {hf_status}
 
 **Commands:**
-/broadcast, /viewstats, /banuser, /unbanuser, /debug, /aitest
+/broadcast, /bcstatus, /viewstats, /banuser, /unbanuser, /debug, /dbcheck, /aitest, /latency
 """
     await message.reply(panel)
 
@@ -258,30 +274,65 @@ async def broadcast_command(client: Client, message: Message):
         await message.reply("❌ /broadcast <message> or reply to message")
         return
     
-    msg = message.reply_to_message if message.reply_to_message else " ".join(message.command[1:])
-    users = await db.get_all_users()
-    success = failed = 0
-    
-    status = await message.reply(f"📤 Broadcasting to {len(users)}...")
-    
-    for uid in users:
-        try:
-            if message.reply_to_message:
-                await msg.copy(uid)
-            else:
-                await client.send_message(uid, msg)
-            success += 1
-            await asyncio.sleep(0.05)
-        except:
-            failed += 1
-        
-        if (success + failed) % 50 == 0:
-            try:
-                await status.edit_text(f"📤 Progress\n✅ {success}\n❌ {failed}")
-            except:
-                pass
+    status = await message.reply("📤 Starting broadcast...")
+    job = await broadcasts.create(client, message, status)
+    await status.edit_text(
+        f"📤 **Broadcast started**\n🆔 `{job.id}`\n👥 {job.doc['total']} users\n\n"
+        "/bcstatus, /bcpause, /bcresume, /bccancel"
+    )
+
+
+async def _get_broadcast_job(message: Message):
+    """Broadcast job doc from the command argument, or the latest one"""
+    job_id = message.command[1] if len(message.command) > 1 else None
+    doc = await broadcasts.find(job_id)
+    if not doc:
+        await message.reply("❌ Broadcast not found")
+    return doc
+
+
+@bot.on_message(filters.command("bcstatus") & filters.user(Config.OWNER_ID) & filters.private)
+async def broadcast_status(client: Client, message: Message):
+    doc = await _get_broadcast_job(message)
+    if not doc:
+        return
     
-    await status.edit_text(f"✅ **Done!**\n✅ Success: {success}\n❌ Failed: {failed}")
+    job = broadcasts.jobs.get(doc["_id"])
+    if job:
+        await message.reply(job.progress_text("running"))
+    else:
+        done = doc.get("success", 0) + doc.get("failed", 0) + doc.get("blocked", 0)
+        await message.reply(
+            f"📤 **Broadcast** `{doc['_id']}` - {doc['status']}\n"
+            f"📊 {done}/{doc.get('total', '?')}\n"
+            f"✅ {doc.get('success', 0)}\n"
+            f"❌ {doc.get('failed', 0)}\n"
+            f"🚫 {doc.get('blocked', 0)} blocked"
+        )
+
+
+@bot.on_message(filters.command("bcpause") & filters.user(Config.OWNER_ID) & filters.private)
+async def broadcast_pause(client: Client, message: Message):
+    doc = await _get_broadcast_job(message)
+    if doc:
+        paused = await broadcasts.pause(doc)
+        await message.reply(f"⏸️ Pausing `{doc['_id']}`" if paused else "❌ Not running")
+
+
+@bot.on_message(filters.command("bcresume") & filters.user(Config.OWNER_ID) & filters.private)
+async def broadcast_resume(client: Client, message: Message):
+    doc = await _get_broadcast_job(message)
+    if doc:
+        resumed = await broadcasts.resume(client, doc)
+        await message.reply(f"▶️ Resumed `{doc['_id']}`" if resumed else "❌ Not paused")
+
+
+@bot.on_message(filters.command("bccancel") & filters.user(Config.OWNER_ID) & filters.private)
+async def broadcast_cancel(client: Client, message: Message):
+    doc = await _get_broadcast_job(message)
+    if doc:
+        cancelled = await broadcasts.cancel(doc)
+        await message.reply(f"🛑 Cancelling `{doc['_id']}`" if cancelled else "❌ Already finished")
 
 
 @bot.on_message(filters.command("banuser") & filters.user(Config.OWNER_ID) & filters.private)
@@ -350,17 +401,132 @@ async def debug_command(client: Client, message: Message):
     else:
         ai_status.append("❌ HF: Not Set")
     
+    ai = get_ai_stats()
+    for provider, info in ai["providers"].items():
+        ai_status.append(f"🏆 {provider}: {info['wins']} wins, avg {info['avg_latency']:.2f}s")
+    ai_status.append(f"📨 Requests: {ai['requests']} | Failed: {ai['failures']} | Mode: {Config.AI_DISPATCH_MODE}")
+    
     ai_info = "\n".join(ai_status)
     
+    # Circuit breakers
+    state_emoji = {"closed": "🟢", "half_open": "🟡", "open": "🔴"}
+    breaker_lines = []
+    for b in get_breaker_states():
+        health = "n/a" if b["health"] is None else f"{b['health']:.2f}"
+        line = f"{state_emoji.get(b['state'], '⚪')} {b['name']}: {b['state']} | err {b['error_rate']:.0%} | {b['avg_latency']:.1f}s | health {health}"
+        if b["retry_in"]:
+            line += f" | retry {b['retry_in']}s"
+        breaker_lines.append(line)
+    breaker_info = "\n".join(breaker_lines) or "No calls yet"
+    
+    # HTTP pool
+    pool = http_client.pool_stats()
+    pool_info = (
+        f"🔌 In use: {pool['in_use']}/{pool['limit']} | Idle: {pool['idle']}\n"
+        f"♻️ Reused: {pool['connections_reused']} | New: {pool['connections_created']}"
+    )
+    
+    # User cache
+    cache = db.user_cache.stats()
+    cache_info = (
+        f"{cache['size']} cached | {cache['hit_rate']:.0%} hits "
+        f"({cache['hits']}/{cache['misses']}) | {cache['evictions']} evicted"
+    )
+    
+    # Rate limits
+    rl = user_limiter.stats()
+    rate_info = (
+        f"Users: {rl['admitted']} ok / {rl['throttled']} throttled ({rl['active_users']} active)\n"
+        f"AI: {ai_limiter.admitted} ok / {ai_limiter.throttled} shed"
+    )
+    
+    # AI work queue
+    sq = ai_scheduler.stats()
+    queue_info = (
+        f"👷 {sq['running']}/{sq['workers']} running | {sq['depth']}/{sq['max_depth']} queued ({sq['waiting_users']} users)\n"
+        f"⏱ Wait avg {sq['avg_wait']:.2f}s | p95 {sq['p95_wait']:.2f}s | max {sq['max_wait']:.1f}s | {sq['shed']} shed"
+    )
+    
+    # Per-user mailboxes
+    mb = mailboxes.stats()
+    mailbox_info = (
+        f"{mb['running']}/{mb['concurrency']} running | {mb['queued']} queued | "
+        f"{mb['busy']}/{mb['boxes']} users busy | {mb['failed']} failed"
+    )
+    
+    # Response cache
+    response_info = "Off"
+    if Config.RESPONSE_CACHE:
+        rc = response_cache.stats()
+        response_info = f"{rc['size']} keys | {rc['hit_rate']:.0%} hits ({rc['hits']}/{rc['misses']}) | {rc['bytes'] // 1024} KB"
+    
+    # Prompt history ring buffers
+    hist = db.history_cache.stats()
+    history_info = f"{hist['users']} users, {hist['turns']} turns | {hist['hit_rate']:.0%} hits | {hist['evictions']} evicted"
+    
+    # Write-behind buffer
+    buffer_info = "Off (direct writes)"
+    if db.conversation_buffer:
+        buf = db.conversation_buffer.stats
+        buffer_info = (
+            f"{len(db.conversation_buffer.turns)} pending | {buf['flushes']} flushes | "
+            f"{buf['flush_errors']} errors | {buf['dropped']} dropped"
+        )
+    
+    # Conversation storage
+    arc = db.archive_stats
+    storage_info = (
+        f"{db.store.name if db.store else 'n/a'} | {arc['archived']} archived | "
+        f"{arc['expired']} expired | {arc['errors']} errors"
+    )
+    
+    # Log pipeline
+    logs = log_pipeline.stats
+    log_queue_info = (
+        f"{len(log_pipeline.queue)} queued | {logs['sent_events']} events in {logs['sent_messages']} msgs | "
+        f"dropped {logs['dropped_full']} full, {logs['dropped_sampled']} sampled | "
+        f"stdout dropped {log_config.dropped}"
+    )
+    
+    # Force sub cache
+    fsub = get_force_sub_stats()
+    fsub_info = f"{fsub['calls_avoided']} calls avoided | {fsub['lookups']} lookups"
+    
+    # In WORKERS mode each figure below is this worker's own
+    worker_info = ""
+    if worker_index is not None:
+        worker_info = f"\n**👷 Worker:** {worker_index + 1}/{Config.WORKERS} (stats are per process)\n"
+    
     debug_text = f"""
 🔍 **System Check**
-
+{worker_info}
 **🤖 AI Providers:**
 {ai_info}
 
+**🔌 Circuit Breakers:**
+{breaker_info}
+
+**🌐 HTTP Pool:**
+{pool_info}
+
 **💾 MongoDB:** {mongo}
+**🗂️ User Cache:** {cache_info}
+**📝 Write Buffer:** {buffer_info}
+**🗄️ Storage:** {storage_info}
+**🧠 History Cache:** {history_info}
+**💬 Response Cache:** {response_info}
+
+**📥 AI Queue:**
+{queue_info}
+**📮 Mailboxes:** {mailbox_info}
+
+**🚦 Rate Limits:**
+{rate_info}
+**🧩 Coalesced:** {coalescer.stats['absorbed']} msgs into {coalescer.stats['batches']} replies
 **📢 Log:** {log_status}
+**📬 Log Queue:** {log_queue_info}
 **🔒 Force Sub:** {force}
+**🧾 Sub Cache:** {fsub_info}
 
 **📊 Users:** {await db.get_total_users()}
 
@@ -373,15 +539,44 @@ async def debug_command(client: Client, message: Message):
     await message.reply(debug_text)
 
 
+@bot.on_message(filters.command("dbcheck") & filters.user(Config.OWNER_ID) & filters.private)
+async def db_check(client: Client, message: Message):
+    if not db.client:
+        await message.reply("❌ MongoDB not connected")
+        return
+    
+    await db.ensure_indexes()
+    results = await db.explain_queries()
+    
+    lines = []
+    for name, stages, uses_index in results:
+        lines.append(f"{'✅' if uses_index else '⚠️'} {name}: {' > '.join(stages)}")
+    
+    await message.reply("🗄️ **Query Plans**\n\n" + "\n".join(lines))
+
+
 @bot.on_message(filters.command("aitest") & filters.user(Config.OWNER_ID) & filters.private)
 async def ai_test(client: Client, message: Message):
     
     test_msg = await message.reply("🔍 Testing AI providers...")
     
-    response = await get_ai_response([
-        {"role": "system", "content": "You are a helpful assistant."},
-        {"role": "user", "content": "Hello! How are you today?"}
-    ], temperature=0.7)
+    # "/aitest fresh" bypasses the response cache to really hit the providers
+    fresh = len(message.command) > 1 and message.command[1].lower() == "fresh"
+    persona = "You are a helpful assistant."
+    prompt = "Hello! How are you today?"
+    cache_key = None if fresh else response_cache.key(prompt, persona, [])
+    
+    response = response_cache.get(cache_key)
+    if response:
+        ai_meta = {"provider": "cache", "latency": 0.0}
+    else:
+        ai_meta = {}
+        response = await ai_scheduler.run(message.from_user.id, lambda: get_ai_response([
+            {"role": "system", "content": persona},
+            {"role": "user", "content": prompt}
+        ], temperature=0.7, meta=ai_meta), priority=True)
+        if ai_meta.get("provider"):
+            response_cache.put(cache_key, response)
     
     # Check response quality
     if response and len(response) > 10 and "❌" not in response and "busy" not in response.lower():
@@ -397,6 +592,8 @@ async def ai_test(client: Client, message: Message):
 **Response:**
 {response}
 
+**Provider:** {ai_meta.get('provider') or 'None'} ({ai_meta.get('latency', 0):.2f}s)
+
 **Configured:**
 {"✅ Cohere" if Config.COHERE_API_KEY else "❌ Cohere"}
 {"✅ Hugging Face" if Config.HUGGINGFACE_API_KEY else "❌ Hugging Face"}
@@ -404,34 +601,64 @@ async def ai_test(client: Client, message: Message):
     
     await test_msg.edit_text(result)
 
+@bot.on_message(filters.command("latency") & filters.user(Config.OWNER_ID) & filters.private)
+async def latency_command(client: Client, message: Message):
+    
+    stage_lines = [
+        f"`{labels['stage']}`: p50 {p50:.2f}s | p95 {p95:.2f}s | avg {avg:.2f}s ({count})"
+        for labels, count, p50, p95, avg in metrics_summary("bot_stage_seconds")
+    ]
+    provider_lines = [
+        f"`{labels['provider']}` {labels['outcome']}: p50 {p50:.2f}s | p95 {p95:.2f}s ({count})"
+        for labels, count, p50, p95, avg in metrics_summary("ai_provider_seconds")
+    ]
+    
+    text = f"""
+⏱ **Reply Latency** (slowest p95 first)
+
+**Stages:**
+{chr(10).join(stage_lines) or "No messages yet"}
+
+**Provider attempts:**
+{chr(10).join(provider_lines) or "No calls yet"}
+
+Full histograms: `/metrics` on the web port{" (all workers)" if worker_index is not None else ""}
+"""
+    await message.reply(text)
+
+
 @bot.on_message(filters.command("viewstats") & filters.user(Config.OWNER_ID) & filters.private)
 async def view_stats(client: Client, message: Message):
-    total = await db.get_total_users()
+    # "/viewstats live" recomputes with one aggregation and corrects the counters
+    live = len(message.command) > 1 and message.command[1].lower() == "live"
+    if live:
+        stats, drift = await db.reconcile_user_stats()
+    else:
+        stats, drift = await db.get_user_stats(), None
     
-    male = await db.users.count_documents({"gender": "male"})
-    female = await db.users.count_documents({"gender": "female"})
-    trans = await db.users.count_documents({"gender": "transgender"})
-    nb = await db.users.count_documents({"gender": "nonbinary"})
-    none = await db.users.count_documents({"gender": None})
+    gender = stats.get("gender", {})
     
-    stats = f"""
-📊 **Statistics**
+    text = f"""
+📊 **Statistics**{" (live)" if live else ""}
 
-**Total:** {total}
+**Total:** {stats.get("total", 0)}
+**Banned:** {stats.get("banned", 0)}
 
 **Gender:**
-👨 Male: {male}
-👩 Female: {female}
-🏳️‍⚧️ Trans: {trans}
-⚧️ NB: {nb}
-❓ Not Set: {none}
+👨 Male: {gender.get("male", 0)}
+👩 Female: {gender.get("female", 0)}
+🏳️‍⚧️ Trans: {gender.get("transgender", 0)}
+⚧️ NB: {gender.get("nonbinary", 0)}
+❓ Not Set: {gender.get("unset", 0)}
 """
-    await message.reply(stats)
+    if drift:
+        text += f"\n🔧 Corrected drift: {drift}"
+    await message.reply(text)
 
 
 # ========== CONVERSATION HANDLER ==========
 
-@bot.on_message(filters.text & filters.private & ~filters.command(["start", "help", "mode", "mood", "reset", "privacy", "ownerpanel", "broadcast", "banuser", "unbanuser", "debug", "viewstats", "aitest"]))
+@bot.on_message(filters.text & filters.private & ~filters.command(["start", "help", "mode", "mood", "reset", "privacy", "ownerpanel", "broadcast", "bcstatus", "bcpause", "bcresume", "bccancel", "banuser", "unbanuser", "debug", "dbcheck", "viewstats", "aitest", "latency"]))
 async def handle_conversation(client: Client, message: Message):
     user_id = message.from_user.id
     
@@ -439,23 +666,78 @@ async def handle_conversation(client: Client, message: Message):
         await message.reply(f"❌ Database error\nContact: {Config.OWNER_CONTACT}")
         return
     
-    is_subscribed, buttons = await check_force_sub(client, user_id)
+    # Bursts join the user's open batch right away, without taking a turn
+    pending = None
+    if Config.COALESCE_ENABLED:
+        if coalescer.absorb(user_id, message):
+            try:
+                await message.react(get_random_reaction())
+            except:
+                pass
+            return
+        pending = coalescer.open(user_id, message)
+    
+    # One turn at a time per user (history stays consistent), many users at once
+    return mailboxes.post(user_id, lambda: converse(client, message, pending))
+
+
+async def converse(client: Client, message: Message, pending):
+    """One conversation turn, run in the user's mailbox"""
+    user_id = message.from_user.id
+    try:
+        await _converse(client, message, pending)
+    finally:
+        if pending is not None:
+            coalescer.release(user_id)
+
+
+async def _converse(client: Client, message: Message, pending):
+    user_id = message.from_user.id
+    
+    with span("force_sub"):
+        is_subscribed, buttons = await check_force_sub(client, user_id)
     if not is_subscribed:
         await message.reply("🔒 Join channel first!", reply_markup=buttons)
         return
     
-    if await db.is_banned(user_id):
+    with span("is_banned"):
+        banned = await db.is_banned(user_id)
+    if banned:
+        return
+    
+    if pending is None:
+        await reply_to_messages(client, [message])
         return
     
+    # Coalesce bursts: follow-up messages join the batch until it's taken
+    with span("coalesce_wait"):
+        batch = await coalescer.collect(pending)
+    while batch:
+        await reply_to_messages(client, batch)
+        batch = coalescer.next_batch(user_id)
+
+
+BUSY_REPLY = "Abhi bahut log baat kar rahe hain 😔\nThodi der baad try karo!"
+
+
+async def reply_to_messages(client: Client, batch):
+    """Generate one reply for one or more messages from the same user"""
+    message = batch[-1]
+    user_id = message.from_user.id
+    text = merge_text(batch)
+    
+    with span("total"):
+        await _reply_to_messages(client, batch, message, user_id, text)
+
+
+async def _reply_to_messages(client: Client, batch, message: Message, user_id, text):
     # Flood control
-    now = time.time()
-    if user_id in user_flood_control:
-        if now - user_flood_control[user_id] < Config.FLOOD_SLEEP:
-            await message.reply("⏳ Wait!")
-            return
-    user_flood_control[user_id] = now
+    if not user_limiter.allow(user_id):
+        await message.reply("⏳ Wait!")
+        return
     
-    user = await db.get_user(user_id)
+    with span("get_user"):
+        user = await db.get_user(user_id)
     if not user:
         await message.reply("⚠️ /start first!")
         return
@@ -477,65 +759,191 @@ async def handle_conversation(client: Client, message: Message):
         pass
     
     # History
-    history = await db.get_conversation_history(user_id, limit=5)
+    with span("history"):
+        history = await db.get_conversation_history(user_id, limit=Config.HISTORY_TURNS_PER_USER)
     history.reverse()
     
-    # Build messages
-    messages = []
+    # Build messages within the token budget, with the long-term summary
     mode = user.get("mode", "balanced")
     gender = user.get("gender")
-    messages.append({"role": "system", "content": get_system_prompt(gender, mode)})
-    
-    for conv in history:
-        messages.append({"role": "user", "content": conv["user_message"]})
-        messages.append({"role": "assistant", "content": conv["bot_response"]})
-    
-    messages.append({"role": "user", "content": message.text})
-    
-    # Get AI response
-    response = await get_ai_response(messages, temperature=0.8)
+    memory = user.get("memory") or {}
+    persona = get_system_prompt(gender, mode)
+    with span("build_prompt"):
+        messages, dropped = build_messages(
+            persona,
+            history,
+            text,
+            summary=memory.get("summary")
+        )
     
-    # Send
-    await message.reply(response)
+    # Older turns that no longer fit get folded into the summary
+    schedule_summary(user_id, memory, dropped)
+    
+    # Cached reply for short repeated messages (greetings etc.); keyed on the
+    # system message actually sent, so a user's memory summary never leaks
+    cache_key = response_cache.key(text, messages[0]["content"], history)
+    response = response_cache.get(cache_key)
+    
+    if response:
+        ai_meta = {"provider": "cache", "latency": 0.0}
+        with span("reply"):
+            await message.reply(response)
+    elif not ai_limiter.try_acquire():
+        # Global provider budget exhausted: answer now instead of piling on
+        await message.reply(BUSY_REPLY)
+        return
+    else:
+        # Get AI response (streamed into a growing reply when supported)
+        ai_meta = {}
+        stream = StreamingReply(message) if Config.STREAM_RESPONSES else None
+        try:
+            with span("ai_response"):
+                response = await ai_scheduler.run(
+                    user_id,
+                    lambda: get_ai_response(
+                        messages,
+                        temperature=0.8,
+                        meta=ai_meta,
+                        on_partial=stream.update if stream else None
+                    ),
+                    priority=user_id in Config.OWNER_ID
+                )
+        except SchedulerBusy:
+            # Queue full: say so now rather than after a provider timeout
+            await message.reply(BUSY_REPLY)
+            return
+        
+        # Only real provider answers are cached, never the fallback text
+        if ai_meta.get("provider"):
+            response_cache.put(cache_key, response)
+        
+        # Send
+        with span("reply"):
+            if stream:
+                await stream.finish(response)
+            else:
+                await message.reply(response)
     
     # Save
-    await db.save_conversation(user_id, message.text, response)
+    with span("save_conversation"):
+        await db.save_conversation(user_id, text, response)
     
     # Log
-    await send_to_log_channel(
-        client,
-        f"💬 **Chat**\n\n"
-        f"👤 {message.from_user.first_name} (`{user_id}`)\n"
-        f"🎭 {gender} | {mode}\n\n"
-        f"**User:** {message.text}\n\n"
-        f"**Bot:** {response[:400]}"
-    )
+    with span("log_channel"):
+        await send_to_log_channel(
+            client,
+            f"💬 **Chat**\n\n"
+            f"👤 {message.from_user.first_name} (`{user_id}`)\n"
+            f"🎭 {gender} | {mode}\n"
+            f"⚡ {ai_meta.get('provider') or 'None'} ({ai_meta.get('latency', 0):.1f}s)"
+            f"{f' | {len(batch)} msgs merged' if len(batch) > 1 else ''}\n\n"
+            f"**User:** {text}\n\n"
+            f"**Bot:** {response[:400]}",
+            kind="chat"
+        )
 
 
 # ========== MAIN ==========
 
-async def main():
+async def start_services(primary=True):
+    """Bring up everything a process that answers chats needs.
+    
+    ``primary`` is False for all but one worker process in multi-process
+    mode: only the primary resumes broadcasts and runs DB maintenance.
+    """
     # Connect to database
     if Config.MONGO_URI:
-        connected = await db.connect()
+        connected = await db.connect(maintenance=primary)
         if connected:
-            print("✅ MongoDB Connected")
+            log.info("✅ MongoDB Connected")
+            if primary and Config.DB_EXPLAIN_ON_START:
+                await db.explain_queries()
         else:
-            print("❌ MongoDB Failed")
+            log.error("❌ MongoDB Failed")
     else:
-        print("⚠️ MongoDB URI not set")
+        log.warning("⚠️ MongoDB URI not set")
+    
+    # Shared HTTP pool for AI providers
+    await http_client.start()
     
     # Start bot
     await bot.start()
-    print(f"✅ {Config.BOT_NAME} Started!")
-    print("🤖 AI: Hugging Face")
+    log.info(f"✅ {Config.BOT_NAME} Started!")
+    
+    # Expire idle per-user rate limit buckets
+    user_limiter.start(Config.RATE_LIMIT_SWEEP_INTERVAL)
+    
+    # Bounded pool for AI generations
+    ai_scheduler.start()
     
-    # Keep alive
-    await asyncio.Event().wait()
+    # Per-user turn ordering
+    mailboxes.start()
+    
+    # Batched log channel sender
+    if Config.LOG_CHANNEL:
+        log_pipeline.start(bot)
+    
+    # Pick up broadcasts interrupted by a restart
+    if primary and db.client:
+        await broadcasts.resume_pending(bot)
+
+
+async def stop_services():
+    user_limiter.stop()
+    await mailboxes.stop()
+    await ai_scheduler.stop()
+    await log_pipeline.stop()
+    await bot.stop()
+    await db.close()
+    await http_client.close()
+
+
+async def run_receiver():
+    """WORKERS > 0: this process only receives updates and supervises workers"""
+    worker_pool.attach(bot)
+    await worker_pool.start()
+    web_server.checks["workers"] = worker_pool.healthy
+    # This process answers no chats: probes and metrics come from the workers' reports
+    web_server.providers = worker_pool.available_providers
+    web_server.render_metrics = worker_pool.render_metrics
+    
+    # Only for /ready; the workers do the real database work
+    if Config.MONGO_URI:
+        await db.connect(maintenance=False)
+    
+    await bot.start()
+    log.info(f"✅ {Config.BOT_NAME} receiver started with {Config.WORKERS} workers")
+    try:
+        await idle()
+    finally:
+        await bot.stop()
+        await worker_pool.stop()
+        await db.close()
+
+
+async def main():
+    # Port binding and health/readiness probes, on this event loop
+    await web_server.start(bot)
+    
+    try:
+        if Config.WORKERS:
+            await run_receiver()
+            return
+        
+        await start_services()
+        
+        # Keep alive until SIGINT/SIGTERM, then shut down cleanly
+        try:
+            await idle()
+        finally:
+            await stop_services()
+    finally:
+        await web_server.stop()
+        stop_logging()
 
 if __name__ == "__main__":
-    # Start Flask
-    Thread(target=run_flask).start()
+    # Log through a background writer before anything else starts
+    setup_logging()
     
     # Run bot
     bot.run(main())
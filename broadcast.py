@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pyrogram import Client
+from pyrogram.errors import (
+    FloodWait,
+    UserIsBlocked,
+    InputUserDeactivated,
+    UserDeactivated,
+    UserDeactivatedBan
+)
+from config import Config
+from database import db
+from ratelimit import TokenBucket
+
+log = logging.getLogger(__name__)
+
+# Errors meaning the user can never receive messages again
+UNREACHABLE_ERRORS = (UserIsBlocked, InputUserDeactivated, UserDeactivated, UserDeactivatedBan)
+
+
+class BroadcastJob:
+    """Runtime state of one broadcast job (its MongoDB doc lives in ``doc``)"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.id = doc["_id"]
+        self.totals = {
+            "success": doc.get("success", 0),
+            "failed": doc.get("failed", 0),
+            "blocked": doc.get("blocked", 0)
+        }
+        self.paused = False
+        self.cancelled = False
+        self.task = None
+        self.inflight = set()
+        self.last_dispatched = None
+
+    def resume_from(self):
+        """Lowest user_id not yet known to be done"""
+        if self.inflight:
+            return min(self.inflight)
+        if self.last_dispatched is not None:
+            return self.last_dispatched + 1
+        return self.doc.get("resume_from")
+
+    def progress_text(self, status):
+        status_emoji = {
+            "running": "📤", "paused": "⏸️", "cancelled": "🛑", "done": "✅"
+        }.get(status, "📤")
+        done = sum(self.totals.values())
+        return (
+            f"{status_emoji} **Broadcast** `{self.id}` - {status}\n"
+            f"📊 {done}/{self.doc.get('total', '?')}\n"
+            f"✅ {self.totals['success']}\n"
+            f"❌ {self.totals['failed']}\n"
+            f"🚫 {self.totals['blocked']} blocked"
+        )
+
+
+class BroadcastManager:
+    """Resumable broadcasts: streamed users, concurrent senders, global rate"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.bucket = TokenBucket(Config.BROADCAST_RATE, Config.BROADCAST_BURST)
+
+    async def create(self, client: Client, message, status_message):
+        """Create a job from a /broadcast command and start it"""
+        doc = {
+            "status": "running",
+            "created": datetime.now(),
+            "owner_id": message.from_user.id,
+            "total": await db.count_reachable_users(),
+            "resume_from": None,
+            "success": 0,
+            "failed": 0,
+            "blocked": 0,
+            "status_chat_id": status_message.chat.id,
+            "status_message_id": status_message.id
+        }
+        if message.reply_to_message:
+            doc["from_chat_id"] = message.chat.id
+            doc["message_id"] = message.reply_to_message.id
+        else:
+            doc["text"] = " ".join(message.command[1:])
+
+        doc["_id"] = await db.create_broadcast(doc)
+        return self.start(client, doc)
+
+    def start(self, client: Client, doc):
+        job = BroadcastJob(doc)
+        self.jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(client, job))
+        return job
+
+    async def resume_pending(self, client: Client):
+        """Restart jobs that were running when the process stopped"""
+        for doc in await db.get_broadcasts_by_status("running"):
+            if doc["_id"] in self.jobs:
+                continue
+            # Paused/cancelled from another process while nobody was running it
+            requested = {"pause": "paused", "cancel": "cancelled"}.get(doc.get("requested"))
+            if requested:
+                await db.update_broadcast(doc["_id"], {"status": requested, "requested": None})
+                continue
+            log.info(f"📤 Resuming broadcast {doc['_id']}")
+            self.start(client, doc)
+
+    async def find(self, job_id=None):
+        """Load a job doc by id (or the latest job)"""
+        if job_id is None:
+            return await db.get_latest_broadcast()
+        try:
+            return await db.get_broadcast(ObjectId(job_id))
+        except InvalidId:
+            return None
+
+    async def pause(self, doc):
+        """Stop feeding senders; the job checkpoints itself as 'paused'"""
+        job = self.jobs.get(doc["_id"])
+        if job:
+            if job.cancelled:
+                return False
+            job.paused = True
+            return True
+        if doc.get("status") == "running":
+            # Running in another worker process: it picks this up at its next checkpoint
+            await db.update_broadcast(doc["_id"], {"requested": "pause"})
+            return True
+        return False
+
+    async def resume(self, client: Client, doc):
+        """Restart a paused job from its checkpoint"""
+        if doc["_id"] in self.jobs:
+            return False
+        if doc.get("status") == "paused":
+            doc["status"] = "running"
+            await db.update_broadcast(doc["_id"], {"status": "running", "requested": None})
+            self.start(client, doc)
+            return True
+        return False
+
+    async def cancel(self, doc):
+        job = self.jobs.get(doc["_id"])
+        if job:
+            job.cancelled = True
+            return True
+        if doc.get("status") == "running":
+            # Running in another worker process: it picks this up at its next checkpoint
+            await db.update_broadcast(doc["_id"], {"requested": "cancel"})
+            return True
+        if doc.get("status") == "paused":
+            await db.update_broadcast(doc["_id"], {"status": "cancelled"})
+            return True
+        return False
+
+    async def _apply_requests(self, job):
+        """Pick up /bcpause or /bccancel issued in another process"""
+        doc = await db.get_broadcast(job.id)
+        requested = doc.get("requested") if doc else None
+        if requested == "cancel":
+            job.cancelled = True
+        elif requested == "pause":
+            job.paused = True
+
+    async def _send(self, client: Client, doc, user_id):
+        """Deliver to one user. Returns 'success', 'failed' or 'blocked'."""
+        for _ in range(Config.BROADCAST_MAX_RETRIES):
+            await self.bucket.acquire()
+            try:
+                if doc.get("message_id"):
+                    await client.copy_message(user_id, doc["from_chat_id"], doc["message_id"])
+                else:
+                    await client.send_message(user_id, doc["text"])
+                return "success"
+            except FloodWait as e:
+                # Honour the wait for every sender, then retry this user
+                self.bucket.pause(e.value)
+                await asyncio.sleep(e.value)
+            except UNREACHABLE_ERRORS:
+                await db.mark_blocked(user_id)
+                return "blocked"
+            except Exception:
+                return "failed"
+        return "failed"
+
+    async def _checkpoint(self, client: Client, job, status):
+        fields = {"status": status, "resume_from": job.resume_from()}
+        if status != "running":
+            fields["requested"] = None
+        fields.update(job.totals)
+        await db.update_broadcast(job.id, fields)
+        try:
+            await client.edit_message_text(
+                job.doc["status_chat_id"],
+                job.doc["status_message_id"],
+                job.progress_text(status)
+            )
+        except Exception:
+            pass
+
+    async def _run(self, client: Client, job):
+        queue = asyncio.Queue(maxsize=Config.BROADCAST_CONCURRENCY * 2)
+
+        async def producer():
+            async for user_id in db.iter_user_ids(job.doc.get("resume_from")):
+                if job.cancelled or job.paused:
+                    break
+                job.inflight.add(user_id)
+                job.last_dispatched = user_id
+                await queue.put(user_id)
+            for _ in range(Config.BROADCAST_CONCURRENCY):
+                await queue.put(None)
+
+        async def sender():
+            while True:
+                user_id = await queue.get()
+                if user_id is None:
+                    return
+                result = await self._send(client, job.doc, user_id)
+                job.totals[result] += 1
+                job.inflight.discard(user_id)
+
+        async def monitor():
+            while True:
+                await asyncio.sleep(Config.BROADCAST_CHECKPOINT_INTERVAL)
+                await self._apply_requests(job)
+                await self._checkpoint(client, job, "running")
+
+        checkpoints = asyncio.ensure_future(monitor())
+        workers = [asyncio.ensure_future(producer())] + [
+            asyncio.ensure_future(sender()) for _ in range(Config.BROADCAST_CONCURRENCY)
+        ]
+        started = time.monotonic()
+        try:
+            await asyncio.gather(*workers)
+            if job.cancelled:
+                status = "cancelled"
+            elif job.paused:
+                status = "paused"
+            else:
+                status = "done"
+            await self._checkpoint(client, job, status)
+            log.info(f"📤 Broadcast {job.id} {status} in {time.monotonic() - started:.0f}s: {job.totals}")
+        except Exception as e:
+            # Leave the job 'running' so it resumes from the checkpoint on restart
+            log.error(f"❌ Broadcast {job.id} error: {str(e)[:150]}")
+            await self._checkpoint(client, job, "running")
+        finally:
+            checkpoints.cancel()
+            for worker in workers:
+                worker.cancel()
+            self.jobs.pop(job.id, None)
+
+
+broadcasts = BroadcastManager()
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with per-entry expiry.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is
+    reached (or, with ``maxbytes`` and ``sizeof``, once the summed entry
+    sizes exceed ``maxbytes``), and treated as missing after their TTL runs
+    out.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key, count):
+        entry = self._data.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return None
+        if count:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return entry
+
+    def get(self, key, default=None):
+        """Get a live value, counting a hit or miss"""
+        entry = self._lookup(key, count=True)
+        return default if entry is None else entry[1]
+
+    def peek(self, key, default=None):
+        """Get a live value without touching LRU order or counters"""
+        entry = self._lookup(key, count=False)
+        return default if entry is None else entry[1]
+
+    def _size(self, value):
+        return self.sizeof(value) if self.sizeof else 0
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self.bytes -= self._size(value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Insert or replace a value, evicting the LRU entry when full"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (expires, value)
+        self.bytes += self._size(value)
+        while len(self._data) > self.maxsize or (
+            self.maxbytes is not None and self.bytes > self.maxbytes and len(self._data) > 1
+        ):
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove a key, returning its value if it was cached"""
+        if key not in self._data:
+            return default
+        return self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __contains__(self, key):
+        return self._lookup(key, count=False) is not None
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Hit/miss/eviction counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
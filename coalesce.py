@@ -0,0 +1,85 @@
+import asyncio
+import time
+from config import Config
+
+
+class _PendingBatch:
+    def __init__(self, message):
+        self.messages = [message]
+        self.arrived = asyncio.Event()
+
+
+class MessageCoalescer:
+    """Merge a user's rapid-fire messages into one generation.
+
+    The first message of a burst opens a batch as soon as it arrives, and
+    messages that arrive while the turn is still queued join it. The turn
+    starts generating right away. Messages that arrive while it is being
+    answered are absorbed and answered together in one follow-up call.
+    An optional debounce (``COALESCE_WINDOW`` > 0) waits that long after
+    the latest message, at most ``COALESCE_MAX_WAIT`` in total, before
+    generating; it trades reply latency for fewer calls and is off by
+    default.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.stats = {"batches": 0, "absorbed": 0}
+
+    def absorb(self, user_id, message):
+        """Attach a message to the user's running batch, if there is one"""
+        batch = self.pending.get(user_id)
+        if batch is None:
+            return False
+        batch.messages.append(message)
+        batch.arrived.set()
+        self.stats["absorbed"] += 1
+        return True
+
+    def open(self, user_id, message):
+        """Start the user's batch with ``message``; check ``absorb`` first"""
+        batch = self.pending[user_id] = _PendingBatch(message)
+        return batch
+
+    async def collect(self, batch):
+        """Wait out the burst, then return the messages to answer now"""
+        await self._debounce(batch)
+        return self._take(batch)
+
+    async def _debounce(self, batch):
+        deadline = time.monotonic() + Config.COALESCE_MAX_WAIT
+        while True:
+            wait = min(Config.COALESCE_WINDOW, deadline - time.monotonic())
+            if wait <= 0:
+                return
+            batch.arrived.clear()
+            try:
+                await asyncio.wait_for(batch.arrived.wait(), wait)
+            except asyncio.TimeoutError:
+                return
+
+    def _take(self, batch):
+        messages, batch.messages = batch.messages, []
+        self.stats["batches"] += 1
+        return messages
+
+    def next_batch(self, user_id):
+        """Messages absorbed during the last generation; releases the user if none"""
+        batch = self.pending.get(user_id)
+        if batch is None:
+            return None
+        if batch.messages:
+            return self._take(batch)
+        del self.pending[user_id]
+        return None
+
+    def release(self, user_id):
+        self.pending.pop(user_id, None)
+
+
+def merge_text(messages):
+    """One prompt from several short messages, in the order they were sent"""
+    return "\n".join(message.text for message in messages if message.text)
+
+
+coalescer = MessageCoalescer()
@@ -12,22 +12,149 @@ class Config:
     
     # Cohere AI (FREE - RECOMMENDED)
     COHERE_API_KEY = getenv("COHERE_API_KEY", "")
+    COHERE_BASE_URL = getenv("COHERE_BASE_URL", "https://api.cohere.ai").rstrip("/")
     
     # Hugging Face (Backup)
     HUGGINGFACE_API_KEY = getenv("HUGGINGFACE_API_KEY", "")
+    HF_BASE_URL = getenv("HF_BASE_URL", "https://api-inference.huggingface.co").rstrip("/")
+    
+    # Provider dispatch: "hedged" races the backup after AI_HEDGE_DELAY, "sequential" waits
+    AI_DISPATCH_MODE = getenv("AI_DISPATCH_MODE", "hedged").lower()
+    AI_HEDGE_DELAY = float(getenv("AI_HEDGE_DELAY", "4"))
+    
+    # Prompt assembly (token budgets are estimates, ~4 chars per token)
+    PROMPT_TOKEN_BUDGET = int(getenv("PROMPT_TOKEN_BUDGET", "1500"))
+    COHERE_CONTEXT_TOKENS = int(getenv("COHERE_CONTEXT_TOKENS", "1500"))
+    HF_CONTEXT_TOKENS = int(getenv("HF_CONTEXT_TOKENS", "256"))
+    PROMPT_HISTORY_TURNS = int(getenv("PROMPT_HISTORY_TURNS", "5"))
+    PROMPT_TURN_MAX_TOKENS = int(getenv("PROMPT_TURN_MAX_TOKENS", "150"))
+    
+    # Rolling summary of older turns kept in users.memory
+    SUMMARY_ENABLED = getenv("SUMMARY_ENABLED", "true").lower() == "true"
+    SUMMARY_MIN_TURNS = int(getenv("SUMMARY_MIN_TURNS", "3"))
+    SUMMARY_MAX_WORDS = int(getenv("SUMMARY_MAX_WORDS", "120"))
+    
+    # Response cache for short repeated messages (opt-in)
+    RESPONSE_CACHE = getenv("RESPONSE_CACHE", "false").lower() == "true"
+    RESPONSE_CACHE_SIZE = int(getenv("RESPONSE_CACHE_SIZE", "5000"))
+    RESPONSE_CACHE_TTL = int(getenv("RESPONSE_CACHE_TTL", "21600"))
+    RESPONSE_CACHE_MAX_BYTES = int(getenv("RESPONSE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+    RESPONSE_CACHE_MAX_CHARS = int(getenv("RESPONSE_CACHE_MAX_CHARS", "40"))
+    RESPONSE_CACHE_VARIANTS = int(getenv("RESPONSE_CACHE_VARIANTS", "5"))
+    RESPONSE_CACHE_REFRESH_RATE = float(getenv("RESPONSE_CACHE_REFRESH_RATE", "0.3"))
+    RESPONSE_CACHE_SESSION_GAP = int(getenv("RESPONSE_CACHE_SESSION_GAP", "1800"))
+    
+    # Streamed replies (Cohere) with rate-limited message edits
+    STREAM_RESPONSES = getenv("STREAM_RESPONSES", "true").lower() == "true"
+    STREAM_EDIT_INTERVAL = float(getenv("STREAM_EDIT_INTERVAL", "1.5"))
+    STREAM_MIN_CHARS = int(getenv("STREAM_MIN_CHARS", "20"))
+    
+    # Circuit breakers (per provider and per HF model)
+    BREAKER_FAILURE_THRESHOLD = int(getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+    BREAKER_ERROR_RATE = float(getenv("BREAKER_ERROR_RATE", "0.5"))
+    BREAKER_WINDOW = int(getenv("BREAKER_WINDOW", "20"))
+    BREAKER_MIN_SAMPLES = int(getenv("BREAKER_MIN_SAMPLES", "5"))
+    BREAKER_COOLDOWN = float(getenv("BREAKER_COOLDOWN", "30"))
+    BREAKER_MAX_COOLDOWN = float(getenv("BREAKER_MAX_COOLDOWN", "600"))
+    BREAKER_AUTH_COOLDOWN = float(getenv("BREAKER_AUTH_COOLDOWN", "900"))
+    BREAKER_LATENCY_REF = float(getenv("BREAKER_LATENCY_REF", "5"))
+    BREAKER_DEMOTE_HEALTH = float(getenv("BREAKER_DEMOTE_HEALTH", "0.5"))
     
     # Database
     MONGO_URI = getenv("MONGO_URI", "")
     DATABASE_NAME = getenv("DATABASE_NAME", "ai_companion_bot")
+    USER_CACHE_SIZE = int(getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = int(getenv("USER_CACHE_TTL", "300"))
+    WRITE_BEHIND = getenv("WRITE_BEHIND", "true").lower() == "true"
+    CONVERSATION_FLUSH_SIZE = int(getenv("CONVERSATION_FLUSH_SIZE", "100"))
+    CONVERSATION_FLUSH_INTERVAL = float(getenv("CONVERSATION_FLUSH_INTERVAL", "2"))
+    CONVERSATION_BUFFER_MAX = int(getenv("CONVERSATION_BUFFER_MAX", "5000"))
+    HISTORY_TURNS_PER_USER = int(getenv("HISTORY_TURNS_PER_USER", "10"))
+    HISTORY_CACHE_MAX_TURNS = int(getenv("HISTORY_CACHE_MAX_TURNS", "200000"))
+    # Conversation storage: "documents" (one per turn) or "buckets" (per user per day)
+    CONVERSATION_STORAGE = getenv("CONVERSATION_STORAGE", "documents").lower()
+    CONVERSATION_BUCKET_TURNS = int(getenv("CONVERSATION_BUCKET_TURNS", "200"))
+    # Delete turns after this many days (0 = keep), compress buckets after this many (0 = never)
+    CONVERSATION_RETENTION_DAYS = int(getenv("CONVERSATION_RETENTION_DAYS", "0"))
+    CONVERSATION_ARCHIVE_DAYS = int(getenv("CONVERSATION_ARCHIVE_DAYS", "30"))
+    CONVERSATION_ARCHIVE_INTERVAL = int(getenv("CONVERSATION_ARCHIVE_INTERVAL", "3600"))
+    STATS_RECONCILE_INTERVAL = int(getenv("STATS_RECONCILE_INTERVAL", "3600"))
+    DB_EXPLAIN_ON_START = getenv("DB_EXPLAIN_ON_START", "false").lower() == "true"
     
     # Channels
     LOG_CHANNEL = int(getenv("LOG_CHANNEL", "0"))
+    LOG_FLUSH_INTERVAL = float(getenv("LOG_FLUSH_INTERVAL", "5"))
+    LOG_QUEUE_MAX = int(getenv("LOG_QUEUE_MAX", "1000"))
+    LOG_DROP_POLICY = getenv("LOG_DROP_POLICY", "oldest").lower()
+    LOG_SAMPLE_THRESHOLD = int(getenv("LOG_SAMPLE_THRESHOLD", "200"))
+    LOG_SAMPLE_RATE = float(getenv("LOG_SAMPLE_RATE", "0.2"))
+    
+    # Process logs (stdout): level, per-module overrides and format (text/json)
+    LOG_LEVEL = getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = getenv("LOG_LEVELS", "")
+    LOG_FORMAT = getenv("LOG_FORMAT", "text").lower()
+    LOG_BUFFER_MAX = int(getenv("LOG_BUFFER_MAX", "10000"))
+    LOG_DEBUG_SAMPLE_RATE = float(getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+    LOG_DEBUG_MAX_PER_SEC = float(getenv("LOG_DEBUG_MAX_PER_SEC", "20"))
     FORCE_SUB_CHANNEL = getenv("FORCE_SUB_CHANNEL", "")
+    FORCE_SUB_CACHE_SIZE = int(getenv("FORCE_SUB_CACHE_SIZE", "50000"))
+    FORCE_SUB_POSITIVE_TTL = int(getenv("FORCE_SUB_POSITIVE_TTL", "600"))
+    FORCE_SUB_NEGATIVE_TTL = int(getenv("FORCE_SUB_NEGATIVE_TTL", "30"))
     
     # Owners
     OWNER_ID = list(map(int, getenv("OWNER_ID", "6518065496 1598576202").split()))
     OWNER_CONTACT = getenv("OWNER_CONTACT", "https://t.me/technicalserena")
     
+    # Broadcast
+    BROADCAST_CONCURRENCY = int(getenv("BROADCAST_CONCURRENCY", "8"))
+    BROADCAST_RATE = float(getenv("BROADCAST_RATE", "25"))
+    BROADCAST_BURST = int(getenv("BROADCAST_BURST", "25"))
+    BROADCAST_MAX_RETRIES = int(getenv("BROADCAST_MAX_RETRIES", "3"))
+    BROADCAST_CHECKPOINT_INTERVAL = float(getenv("BROADCAST_CHECKPOINT_INTERVAL", "10"))
+    
     # Settings
     FLOOD_SLEEP = int(getenv("FLOOD_SLEEP", "3"))
+    
+    # Rate limiting: per-user token bucket (refills one message per FLOOD_SLEEP
+    # seconds by default) and a global budget for AI provider calls
+    RATE_LIMIT_RATE = float(getenv("RATE_LIMIT_RATE", str(1 / max(FLOOD_SLEEP, 1))))
+    RATE_LIMIT_BURST = int(getenv("RATE_LIMIT_BURST", "3"))
+    RATE_LIMIT_IDLE_TTL = int(getenv("RATE_LIMIT_IDLE_TTL", "300"))
+    RATE_LIMIT_SWEEP_INTERVAL = int(getenv("RATE_LIMIT_SWEEP_INTERVAL", "60"))
+    GLOBAL_AI_RATE = float(getenv("GLOBAL_AI_RATE", "20"))
+    GLOBAL_AI_BURST = int(getenv("GLOBAL_AI_BURST", "40"))
+    
+    # AI work queue: concurrent generations and how many may wait
+    AI_WORKERS = int(getenv("AI_WORKERS", "16"))
+    AI_QUEUE_MAX = int(getenv("AI_QUEUE_MAX", "100"))
+    
+    # Per-user mailboxes: conversation turns run in order per user, this many users at once
+    MAILBOX_CONCURRENCY = int(getenv("MAILBOX_CONCURRENCY", "256"))
+    MAILBOX_IDLE_TTL = int(getenv("MAILBOX_IDLE_TTL", "300"))
+    # Pyrogram handler tasks (0 = Pyrogram's default)
+    PYROGRAM_WORKERS = int(getenv("PYROGRAM_WORKERS", "0"))
+    
+    # Multi-process mode: 0 = single process, N = receiver + N worker processes
+    WORKERS = int(getenv("WORKERS", "0"))
+    WORKER_SOCKET = getenv("WORKER_SOCKET", "/tmp/ai_companion_bot-workers.sock")
+    # Frames queued per worker before the oldest are dropped
+    WORKER_BACKLOG = int(getenv("WORKER_BACKLOG", "10000"))
+    WORKER_RESTART_DELAY = float(getenv("WORKER_RESTART_DELAY", "1"))
+    WORKER_STATS_INTERVAL = float(getenv("WORKER_STATS_INTERVAL", "5"))
+    
+    # Merge a user's rapid-fire messages into one AI call; the debounce
+    # window (seconds before generating) adds latency, so it is opt-in
+    COALESCE_ENABLED = getenv("COALESCE_ENABLED", "true").lower() == "true"
+    COALESCE_WINDOW = float(getenv("COALESCE_WINDOW", "0"))
+    COALESCE_MAX_WAIT = float(getenv("COALESCE_MAX_WAIT", "3.0"))
     PORT = int(getenv("PORT", "8080"))
+    
+    # AI Provider HTTP pool
+    HTTP_POOL_LIMIT = int(getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+    HTTP_DNS_TTL = int(getenv("HTTP_DNS_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+    HTTP_CONNECT_TIMEOUT = float(getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    HTTP_TOTAL_TIMEOUT = float(getenv("HTTP_TOTAL_TIMEOUT", "90"))
+    COHERE_TIMEOUT = float(getenv("COHERE_TIMEOUT", "30"))
+    HF_TIMEOUT = float(getenv("HF_TIMEOUT", "60"))
@@ -0,0 +1,228 @@
+import zlib
+from collections import OrderedDict
+import bson
+from bson import Binary
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from config import Config
+
+
+class DocumentStore:
+    """One document per turn in ``conversations`` (the original layout)"""
+
+    name = "documents"
+
+    def __init__(self, db):
+        self.collection = db["conversations"]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("user_id", ASCENDING), ("timestamp", DESCENDING)],
+            name="user_id_timestamp"
+        )
+        if Config.CONVERSATION_RETENTION_DAYS:
+            await self.collection.create_index([("timestamp", ASCENDING)], name="timestamp")
+
+    async def insert(self, turns):
+        await self.collection.insert_many(turns, ordered=False)
+
+    async def recent(self, user_id, since=None, limit=10):
+        """Newest-first turns of a user, after ``since`` if given"""
+        query = {"user_id": user_id}
+        if since:
+            query["timestamp"] = {"$gt": since}
+        cursor = self.collection.find(query).sort("timestamp", -1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def iter_turns(self, since=None, until=None):
+        """Every turn in [since, until), in no particular order"""
+        query = {}
+        if since or until:
+            query["timestamp"] = {}
+            if since:
+                query["timestamp"]["$gte"] = since
+            if until:
+                query["timestamp"]["$lt"] = until
+        async for turn in self.collection.find(query).batch_size(1000):
+            yield turn
+
+    async def expire(self, before):
+        """Delete turns older than ``before``; returns how many"""
+        result = await self.collection.delete_many({"timestamp": {"$lt": before}})
+        return result.deleted_count
+
+    async def archive(self, before):
+        # Single turns are too small to be worth compressing
+        return 0
+
+    def history_plan(self):
+        return {
+            "find": "conversations",
+            "filter": {"user_id": 0},
+            "sort": {"timestamp": -1},
+            "limit": 10
+        }
+
+
+class BucketStore:
+    """Turns grouped into one ``conversation_buckets`` document per user per day.
+
+    A bucket keeps its turns oldest first, with ``start``/``end``
+    timestamps, and takes new ones until it holds
+    ``CONVERSATION_BUCKET_TURNS`` (a batched flush may overshoot a little),
+    so recent history is one or two documents. Writes keep the turns
+    sorted and only ever widen ``start``/``end``, so a late migration run
+    can add older turns to a day the bot has already written to. Buckets older than the
+    archive age get their turns replaced by a zlib-compressed BSON
+    ``archive`` blob.
+    """
+
+    name = "buckets"
+
+    def __init__(self, db):
+        self.collection = db["conversation_buckets"]
+        self.bucket_turns = Config.CONVERSATION_BUCKET_TURNS
+
+    async def ensure_indexes(self):
+        await self.collection.create_index(
+            [("user_id", ASCENDING), ("end", DESCENDING)],
+            name="user_id_end"
+        )
+        await self.collection.create_index(
+            [("archived", ASCENDING), ("end", ASCENDING)],
+            name="archived_end"
+        )
+
+    @staticmethod
+    def _day(timestamp):
+        return timestamp.strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _embed(turn):
+        # user_id lives on the bucket
+        return {
+            "_id": turn["_id"],
+            "user_message": turn["user_message"],
+            "bot_response": turn["bot_response"],
+            "timestamp": turn["timestamp"]
+        }
+
+    def bucket_updates(self, turns):
+        """UpdateOne requests appending ``turns`` (oldest first) to their buckets"""
+        groups = OrderedDict()
+        for turn in turns:
+            groups.setdefault((turn["user_id"], self._day(turn["timestamp"])), []).append(turn)
+
+        requests = []
+        for (user_id, day), group in groups.items():
+            for i in range(0, len(group), self.bucket_turns):
+                chunk = group[i:i + self.bucket_turns]
+                # A full bucket no longer matches, so the upsert opens the next one
+                requests.append(UpdateOne(
+                    {"user_id": user_id, "day": day, "archived": False, "count": {"$lt": self.bucket_turns}},
+                    {
+                        "$push": {"turns": {
+                            "$each": [self._embed(turn) for turn in chunk],
+                            "$sort": {"timestamp": 1}
+                        }},
+                        "$inc": {"count": len(chunk)},
+                        "$min": {"start": chunk[0]["timestamp"]},
+                        "$max": {"end": chunk[-1]["timestamp"]}
+                    },
+                    upsert=True
+                ))
+        return requests
+
+    async def insert(self, turns):
+        # Ordered: a second chunk for the same day must see the first one's count
+        await self.collection.bulk_write(self.bucket_updates(turns), ordered=True)
+
+    @staticmethod
+    def _turns(bucket):
+        """A bucket's turns, oldest first, unpacking archived ones"""
+        if bucket.get("archived"):
+            return bson.decode(zlib.decompress(bucket["archive"]))["turns"]
+        return bucket.get("turns", [])
+
+    async def recent(self, user_id, since=None, limit=10):
+        """Newest-first turns of a user, after ``since`` if given"""
+        query = {"user_id": user_id}
+        if since:
+            query["end"] = {"$gt": since}
+        cursor = self.collection.find(query, {"turns": {"$slice": -limit}}).sort("end", -1).batch_size(2)
+
+        history = []
+        seen = set()
+        async for bucket in cursor:
+            # Buckets of one day can overlap in time (a migration run after the
+            # switch), so stop only once no older bucket can hold a newer turn
+            if len(history) >= limit and bucket["end"] <= history[limit - 1]["timestamp"]:
+                break
+            for turn in reversed(self._turns(bucket)):
+                # A retried flush can push a turn twice
+                if turn["_id"] in seen or (since and turn["timestamp"] <= since):
+                    continue
+                seen.add(turn["_id"])
+                history.append(dict(turn, user_id=user_id))
+            history.sort(key=lambda turn: turn["timestamp"], reverse=True)
+        return history[:limit]
+
+    async def iter_turns(self, since=None, until=None):
+        """Every turn in [since, until), in no particular order"""
+        query = {}
+        if since:
+            query["end"] = {"$gte": since}
+        if until:
+            query["start"] = {"$lt": until}
+        async for bucket in self.collection.find(query).batch_size(100):
+            for turn in self._turns(bucket):
+                if (since and turn["timestamp"] < since) or (until and turn["timestamp"] >= until):
+                    continue
+                yield dict(turn, user_id=bucket["user_id"])
+
+    async def expire(self, before):
+        """Delete buckets whose newest turn is older than ``before``; returns how many"""
+        # $in keeps the archived_end index usable
+        result = await self.collection.delete_many({"archived": {"$in": [False, True]}, "end": {"$lt": before}})
+        return result.deleted_count
+
+    async def archive(self, before, batch_size=500):
+        """Compress buckets that ended before ``before``; returns how many"""
+        archived = 0
+        while True:
+            cursor = self.collection.find({"archived": False, "end": {"$lt": before}}).limit(batch_size)
+            buckets = await cursor.to_list(length=batch_size)
+            if not buckets:
+                return archived
+
+            requests = [
+                UpdateOne(
+                    {"_id": bucket["_id"], "archived": False},
+                    {
+                        "$set": {
+                            "archived": True,
+                            "archive": Binary(zlib.compress(bson.encode({"turns": bucket.get("turns", [])}), 9))
+                        },
+                        "$unset": {"turns": ""}
+                    }
+                )
+                for bucket in buckets
+            ]
+            result = await self.collection.bulk_write(requests, ordered=False)
+            archived += result.modified_count
+            if len(buckets) < batch_size or not result.modified_count:
+                return archived
+
+    def history_plan(self):
+        return {
+            "find": "conversation_buckets",
+            "filter": {"user_id": 0},
+            "sort": {"end": -1},
+            "limit": 2
+        }
+
+
+def create_store(db):
+    """The conversation store selected by ``CONVERSATION_STORAGE``"""
+    if Config.CONVERSATION_STORAGE == "buckets":
+        return BucketStore(db)
+    return DocumentStore(db)
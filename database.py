@@ -1,6 +1,199 @@
+import asyncio
+import logging
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
 from config import Config
-from datetime import datetime
+from cache import TTLCache
+from conversation_store import create_store
+from datetime import datetime, timedelta
+from collections import OrderedDict, deque
+
+log = logging.getLogger(__name__)
+
+class ConversationBuffer:
+    """Write-behind buffer for conversation turns.
+    
+    Turns and conversation_count increments are collected in memory and
+    written with one insert_many plus one bulk_write, either when
+    ``CONVERSATION_FLUSH_SIZE`` turns are pending, every
+    ``CONVERSATION_FLUSH_INTERVAL`` seconds, or on shutdown. Once
+    ``CONVERSATION_BUFFER_MAX`` turns are pending, callers wait for a flush.
+    """
+    
+    def __init__(self, database):
+        self.database = database
+        self.turns = []
+        self.counts = {}
+        self.flushing = []
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.stats = {"buffered": 0, "flushes": 0, "flush_errors": 0, "dropped": 0, "backpressure_waits": 0}
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush_loop())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Waits for a flush the loop had in flight, then writes the rest
+        await self.flush()
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(Config.CONVERSATION_FLUSH_INTERVAL)
+            # Shielded: stopping the loop must not abandon a batch mid-write
+            await asyncio.shield(self.flush())
+    
+    async def add(self, conversation):
+        """Queue a turn; only waits when the buffer is full"""
+        if len(self.turns) >= Config.CONVERSATION_BUFFER_MAX:
+            self.stats["backpressure_waits"] += 1
+            await self.flush()
+        
+        user_id = conversation["user_id"]
+        self.turns.append(conversation)
+        self.counts[user_id] = self.counts.get(user_id, 0) + 1
+        self.stats["buffered"] += 1
+        
+        if len(self.turns) >= Config.CONVERSATION_FLUSH_SIZE and not self._lock.locked():
+            asyncio.ensure_future(self.flush())
+    
+    def pending_for(self, user_id):
+        """Unflushed (or in-flight) turns of a user, oldest first"""
+        return [turn for turn in self.flushing + self.turns if turn["user_id"] == user_id]
+    
+    async def flush(self):
+        async with self._lock:
+            if not self.turns and not self.counts:
+                return
+            
+            self.flushing, self.turns = self.turns, []
+            counts, self.counts = self.counts, {}
+            failed = False
+            
+            # Turns and counters are separate phases: a failed counter write
+            # must not send already stored turns round again
+            try:
+                if self.flushing:
+                    await self._insert(self.flushing)
+            except Exception as e:
+                log.error(f"❌ Conversation flush error: {str(e)[:150]}")
+                self.turns = self.flushing + self.turns
+                failed = True
+            finally:
+                self.flushing = []
+            
+            try:
+                if counts:
+                    await self.database.users.bulk_write([
+                        UpdateOne({"user_id": user_id}, {"$inc": {"conversation_count": count}})
+                        for user_id, count in counts.items()
+                    ], ordered=False)
+            except Exception as e:
+                log.error(f"❌ Conversation count flush error: {str(e)[:150]}")
+                for user_id, count in counts.items():
+                    self.counts[user_id] = self.counts.get(user_id, 0) + count
+                failed = True
+            
+            if failed:
+                self.stats["flush_errors"] += 1
+                self._trim()
+            else:
+                self.stats["flushes"] += 1
+    
+    async def _insert(self, turns):
+        """Store turns; ones already stored by an earlier, partly applied try count as done"""
+        try:
+            await self.database.store.insert(turns)
+        except BulkWriteError as e:
+            # Turns carry fixed _ids, so a retry reports duplicates (E11000) for those
+            errors = e.details.get("writeErrors", [])
+            if not errors or any(error.get("code") != 11000 for error in errors):
+                raise
+    
+    def _trim(self):
+        """Drop the oldest requeued turns over the cap"""
+        overflow = len(self.turns) - Config.CONVERSATION_BUFFER_MAX
+        if overflow > 0:
+            del self.turns[:overflow]
+            self.stats["dropped"] += overflow
+
+
+class HistoryCache:
+    """Per-user ring buffers of recent conversation turns.
+    
+    A user's buffer is hydrated from MongoDB on first use and appended to as
+    turns are saved. Buffers are evicted least-recently-used first so the
+    total number of cached turns stays under ``HISTORY_CACHE_MAX_TURNS``.
+    """
+    
+    def __init__(self, turns_per_user, max_turns):
+        self.turns_per_user = turns_per_user
+        self.max_turns = max_turns
+        self.buffers = OrderedDict()
+        self.total_turns = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, user_id, limit):
+        """Newest-first turns, or None if not cached (or limit too large)"""
+        buffer = self.buffers.get(user_id)
+        if buffer is None or limit > self.turns_per_user:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.buffers.move_to_end(user_id)
+        return list(reversed(buffer))[:limit]
+    
+    def hydrate(self, user_id, turns):
+        """Seed a buffer with newest-first turns loaded from the database"""
+        if user_id in self.buffers:
+            return
+        buffer = deque(reversed(turns[:self.turns_per_user]), maxlen=self.turns_per_user)
+        self.buffers[user_id] = buffer
+        self.total_turns += len(buffer)
+        self._evict()
+    
+    def append(self, user_id, turn):
+        """Add a saved turn to a hydrated buffer (others hydrate on next read)"""
+        buffer = self.buffers.get(user_id)
+        if buffer is None:
+            return
+        if len(buffer) < buffer.maxlen:
+            self.total_turns += 1
+        buffer.append(turn)
+        self.buffers.move_to_end(user_id)
+        self._evict()
+    
+    def clear(self, user_id):
+        """Start the user over with an empty (but hydrated) buffer"""
+        buffer = self.buffers.pop(user_id, None)
+        if buffer is not None:
+            self.total_turns -= len(buffer)
+        self.buffers[user_id] = deque(maxlen=self.turns_per_user)
+    
+    def _evict(self):
+        while self.total_turns > self.max_turns and len(self.buffers) > 1:
+            _, buffer = self.buffers.popitem(last=False)
+            self.total_turns -= len(buffer)
+            self.evictions += 1
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self.buffers),
+            "turns": self.total_turns,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
 
 class Database:
     def __init__(self):
@@ -8,22 +201,145 @@ class Database:
         self.db = None
         self.users = None
         self.conversations = None
+        self.store = None
+        self.broadcasts = None
+        self.counters = None
+        self._reconcile_task = None
+        self._archive_task = None
+        self.archive_stats = {"runs": 0, "archived": 0, "expired": 0, "errors": 0}
+        # Write-through cache of user documents (keyed by user_id)
+        self.user_cache = TTLCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+        # Called with a user_id after writing someone else's document (ban,
+        # unban, blocked); multi-process mode uses it to invalidate the
+        # owning worker's cache
+        self.on_user_changed = None
+        self.conversation_buffer = ConversationBuffer(self) if Config.WRITE_BEHIND else None
+        self.history_cache = HistoryCache(Config.HISTORY_TURNS_PER_USER, Config.HISTORY_CACHE_MAX_TURNS)
+        
+    async def connect(self, client=None, maintenance=True):
+        """Connect to MongoDB (or use ``client``, e.g. the benchmark stand-in).
         
-    async def connect(self):
-        """Connect to MongoDB"""
+        ``maintenance`` runs the periodic stats reconcile and conversation
+        retention/archival in this process.
+        """
         if not Config.MONGO_URI:
             return False
         try:
-            self.client = AsyncIOMotorClient(Config.MONGO_URI)
+            self.client = client or AsyncIOMotorClient(Config.MONGO_URI)
             self.db = self.client[Config.DATABASE_NAME]
             self.users = self.db['users']
             self.conversations = self.db['conversations']
+            self.store = create_store(self.db)
+            self.broadcasts = self.db['broadcasts']
+            self.counters = self.db['counters']
             # Test connection
             await self.client.admin.command('ping')
+            await self.ensure_indexes()
+            if self.conversation_buffer:
+                self.conversation_buffer.start()
+            if maintenance and self._reconcile_task is None:
+                self._reconcile_task = asyncio.ensure_future(self._reconcile_loop())
+            if maintenance and self._archive_task is None and (
+                Config.CONVERSATION_RETENTION_DAYS or Config.CONVERSATION_ARCHIVE_DAYS
+            ):
+                self._archive_task = asyncio.ensure_future(self._archive_loop())
             return True
         except Exception as e:
-            print(f"MongoDB Connection Error: {e}")
+            log.error(f"MongoDB Connection Error: {e}")
+            return False
+    
+    async def ping(self, timeout=2.0):
+        """True if MongoDB answers a ping within ``timeout`` seconds"""
+        if not self.client:
             return False
+        try:
+            await asyncio.wait_for(self.client.admin.command('ping'), timeout)
+            return True
+        except Exception:
+            return False
+    
+    async def close(self):
+        """Flush buffered writes and close the connection"""
+        if self.conversation_buffer:
+            await self.conversation_buffer.stop()
+        if self._reconcile_task:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+        if self._archive_task:
+            self._archive_task.cancel()
+            self._archive_task = None
+        if self.client:
+            self.client.close()
+    
+    async def ensure_indexes(self):
+        """Create the indexes every Database query relies on (idempotent)"""
+        try:
+            await self.users.create_index([("user_id", ASCENDING)], unique=True, name="user_id_unique")
+        except OperationFailure as e:
+            # Existing duplicate user docs block the unique index; still index the field
+            log.warning(f"⚠️ Unique users.user_id index failed ({str(e)[:100]}), creating non-unique")
+            await self.users.create_index([("user_id", ASCENDING)], name="user_id")
+        
+        await self.users.create_index([("gender", ASCENDING)], name="gender")
+        await self.store.ensure_indexes()
+        await self.broadcasts.create_index([("status", ASCENDING)], name="status")
+        await self.broadcasts.create_index([("created", DESCENDING)], name="created")
+    
+    def _query_plans(self):
+        """(name, collection, explain command) for each Database query shape"""
+        def count(collection, query):
+            # count_documents runs as an aggregation
+            return {
+                "aggregate": collection,
+                "pipeline": [{"$match": query}, {"$group": {"_id": 1, "n": {"$sum": 1}}}],
+                "cursor": {}
+            }
+        
+        return [
+            ("get_user", {"find": "users", "filter": {"user_id": 0}, "limit": 1}),
+            ("count by gender", count("users", {"gender": "male"})),
+            ("iter_user_ids", {
+                "find": "users",
+                "filter": {"blocked": {"$ne": True}, "user_id": {"$gte": 0}},
+                "projection": {"user_id": 1, "_id": 0},
+                "sort": {"user_id": 1}
+            }),
+            ("get_conversation_history", self.store.history_plan()),
+            ("broadcasts by status", {"find": "broadcasts", "filter": {"status": "running"}}),
+            ("latest broadcast", {"find": "broadcasts", "filter": {}, "sort": {"created": -1}, "limit": 1})
+        ]
+    
+    @staticmethod
+    def _plan_stages(plan):
+        """All stage names in the winning plan (rejected plans skipped)"""
+        stages = []
+        if isinstance(plan, dict):
+            if "stage" in plan:
+                stages.append(plan["stage"])
+            for key, value in plan.items():
+                if key != "rejectedPlans":
+                    stages.extend(Database._plan_stages(value))
+        elif isinstance(plan, list):
+            for item in plan:
+                stages.extend(Database._plan_stages(item))
+        return stages
+    
+    async def explain_queries(self):
+        """Explain each query shape; returns [(name, stages, uses_index)]"""
+        results = []
+        for name, command in self._query_plans():
+            try:
+                explain = await self.db.command("explain", command, verbosity="queryPlanner")
+            except Exception as e:
+                results.append((name, [f"error: {str(e)[:60]}"], False))
+                continue
+            stages = self._plan_stages(explain)
+            results.append((name, stages, "COLLSCAN" not in stages))
+        
+        for name, stages, uses_index in results:
+            if not uses_index:
+                log.warning(f"⚠️ Query '{name}' is not using an index: {' > '.join(stages)}")
+        return results
     
     async def add_user(self, user_id, first_name, username=None):
         """Add new user to database"""
@@ -38,22 +354,58 @@ class Database:
             "memory": {},
             "conversation_count": 0
         }
-        await self.users.update_one(
+        # /start again means the user is reachable even if a broadcast marked them blocked
+        result = await self.users.update_one(
             {"user_id": user_id},
-            {"$setOnInsert": user_data},
+            {"$setOnInsert": user_data, "$set": {"blocked": False}},
             upsert=True
         )
+        if result.upserted_id is not None:
+            user_data["_id"] = result.upserted_id
+            user_data["blocked"] = False
+            self.user_cache.set(user_id, user_data)
+            await self._inc_user_stats({"total": 1, "gender.unset": 1})
+        else:
+            self._update_cached_user(user_id, {"blocked": False})
     
     async def get_user(self, user_id):
         """Get user data"""
-        return await self.users.find_one({"user_id": user_id})
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        user = await self.users.find_one({"user_id": user_id})
+        if user is not None:
+            self.user_cache.set(user_id, user)
+        return user
+    
+    def _update_cached_user(self, user_id, fields=None, inc=None):
+        """Apply a successful write to the cached user document, if any"""
+        user = self.user_cache.peek(user_id)
+        if user is None:
+            return
+        if fields:
+            user.update(fields)
+        for key, amount in (inc or {}).items():
+            user[key] = user.get(key, 0) + amount
+    
+    def _user_changed(self, user_id):
+        if self.on_user_changed:
+            self.on_user_changed(user_id)
     
     async def set_gender(self, user_id, gender):
         """Set user gender"""
-        await self.users.update_one(
-            {"user_id": user_id},
-            {"$set": {"gender": gender}}
+        before = await self.users.find_one_and_update(
+            {"user_id": user_id, "gender": {"$ne": gender}},
+            {"$set": {"gender": gender}},
+            projection={"gender": 1},
+            return_document=ReturnDocument.BEFORE
         )
+        self._update_cached_user(user_id, {"gender": gender})
+        if before is not None:
+            await self._inc_user_stats({
+                f"gender.{before.get('gender') or 'unset'}": -1,
+                f"gender.{gender or 'unset'}": 1
+            })
     
     async def update_memory(self, user_id, memory_data):
         """Update user memory"""
@@ -61,6 +413,7 @@ class Database:
             {"user_id": user_id},
             {"$set": {"memory": memory_data}}
         )
+        self._update_cached_user(user_id, {"memory": memory_data})
     
     async def get_memory(self, user_id):
         """Get user memory"""
@@ -68,11 +421,14 @@ class Database:
         return user.get("memory", {}) if user else {}
     
     async def reset_memory(self, user_id):
-        """Reset user memory"""
+        """Reset user memory (prompt history restarts from now)"""
+        fields = {"memory": {}, "history_reset_at": datetime.now()}
         await self.users.update_one(
             {"user_id": user_id},
-            {"$set": {"memory": {}}}
+            {"$set": fields}
         )
+        self._update_cached_user(user_id, fields)
+        self.history_cache.clear(user_id)
     
     async def set_mode(self, user_id, mode):
         """Set user conversation mode"""
@@ -80,41 +436,77 @@ class Database:
             {"user_id": user_id},
             {"$set": {"mode": mode}}
         )
+        self._update_cached_user(user_id, {"mode": mode})
     
     async def save_conversation(self, user_id, user_message, bot_response):
         """Save conversation history"""
         conversation = {
+            "_id": ObjectId(),
             "user_id": user_id,
             "user_message": user_message,
             "bot_response": bot_response,
             "timestamp": datetime.now()
         }
-        await self.conversations.insert_one(conversation)
-        await self.users.update_one(
-            {"user_id": user_id},
-            {"$inc": {"conversation_count": 1}}
-        )
+        if self.conversation_buffer:
+            # Write-behind: persisted by the next batched flush
+            await self.conversation_buffer.add(conversation)
+        else:
+            await self.store.insert([conversation])
+            await self.users.update_one(
+                {"user_id": user_id},
+                {"$inc": {"conversation_count": 1}}
+            )
+        self._update_cached_user(user_id, inc={"conversation_count": 1})
+        self.history_cache.append(user_id, conversation)
     
     async def get_conversation_history(self, user_id, limit=10):
-        """Get recent conversation history"""
-        cursor = self.conversations.find(
-            {"user_id": user_id}
-        ).sort("timestamp", -1).limit(limit)
-        return await cursor.to_list(length=limit)
+        """Get recent conversation history (newest first)"""
+        history = self.history_cache.get(user_id, limit)
+        if history is not None:
+            return history
+        
+        history = await self._load_history(user_id, max(limit, Config.HISTORY_TURNS_PER_USER))
+        self.history_cache.hydrate(user_id, history)
+        return history[:limit]
+    
+    async def _load_history(self, user_id, limit):
+        """Read recent turns from MongoDB plus any still in the write buffer"""
+        user = await self.get_user(user_id)
+        reset_at = user.get("history_reset_at") if user else None
+        history = await self.store.recent(user_id, since=reset_at, limit=limit)
+        
+        # Read-your-writes: include turns still waiting in the buffer
+        if self.conversation_buffer:
+            pending = self.conversation_buffer.pending_for(user_id)
+            if reset_at:
+                pending = [conv for conv in pending if conv["timestamp"] > reset_at]
+            if pending:
+                seen = {conv["_id"] for conv in history}
+                newest = [conv for conv in reversed(pending) if conv["_id"] not in seen]
+                history = (newest + history)[:limit]
+        return history
     
     async def ban_user(self, user_id):
         """Ban a user"""
-        await self.users.update_one(
-            {"user_id": user_id},
+        result = await self.users.update_one(
+            {"user_id": user_id, "banned": {"$ne": True}},
             {"$set": {"banned": True}}
         )
+        self._update_cached_user(user_id, {"banned": True})
+        self._user_changed(user_id)
+        if result.modified_count:
+            await self._inc_user_stats({"banned": 1})
     
     async def unban_user(self, user_id):
         """Unban a user"""
-        await self.users.update_one(
-            {"user_id": user_id},
+        result = await self.users.update_one(
+            {"user_id": user_id, "banned": True},
             {"$set": {"banned": False}}
         )
+        self._update_cached_user(user_id, {"banned": False})
+        self._user_changed(user_id)
+        if result.modified_count:
+            await self._inc_user_stats({"banned": -1})
     
     async def is_banned(self, user_id):
         """Check if user is banned"""
@@ -122,12 +514,139 @@ class Database:
         return user.get("banned", False) if user else False
     
     async def get_total_users(self):
-        """Get total users count"""
-        return await self.users.count_documents({})
+        """Get total users count (from the materialized counters)"""
+        stats = await self.get_user_stats()
+        return stats.get("total", 0)
+    
+    async def _inc_user_stats(self, inc):
+        """Apply an incremental change to the materialized user counters"""
+        await self.counters.update_one({"_id": "user_stats"}, {"$inc": inc}, upsert=True)
+    
+    async def get_user_stats(self):
+        """Materialized user counters: total, banned and per-gender (O(1) read)"""
+        stats = await self.counters.find_one({"_id": "user_stats"})
+        if stats is None:
+            stats, _ = await self.reconcile_user_stats()
+        return stats
+    
+    async def aggregate_user_stats(self):
+        """Ad-hoc breakdown computed with a single $group pass over users"""
+        stats = {"total": 0, "banned": 0, "gender": {}}
+        cursor = self.users.aggregate([
+            {"$group": {
+                "_id": "$gender",
+                "count": {"$sum": 1},
+                "banned": {"$sum": {"$cond": [{"$eq": ["$banned", True]}, 1, 0]}}
+            }}
+        ])
+        async for group in cursor:
+            gender = group["_id"] or "unset"
+            stats["gender"][gender] = stats["gender"].get(gender, 0) + group["count"]
+            stats["total"] += group["count"]
+            stats["banned"] += group["banned"]
+        return stats
+    
+    async def reconcile_user_stats(self):
+        """Recompute the counters from users; returns (stats, drift)"""
+        actual = await self.aggregate_user_stats()
+        current = await self.counters.find_one({"_id": "user_stats"}) or {}
+        
+        drift = {}
+        for key in ["total", "banned"]:
+            if current.get(key, 0) != actual[key]:
+                drift[key] = actual[key] - current.get(key, 0)
+        current_gender = current.get("gender", {})
+        for gender in set(actual["gender"]) | set(current_gender):
+            diff = actual["gender"].get(gender, 0) - current_gender.get(gender, 0)
+            if diff:
+                drift[f"gender.{gender}"] = diff
+        
+        actual["reconciled_at"] = datetime.now()
+        await self.counters.replace_one({"_id": "user_stats"}, actual, upsert=True)
+        return actual, drift
+    
+    async def _reconcile_loop(self):
+        while True:
+            try:
+                _, drift = await self.reconcile_user_stats()
+                if drift:
+                    log.info(f"📊 Stats counters corrected: {drift}")
+            except Exception as e:
+                log.error(f"❌ Stats reconcile error: {str(e)[:150]}")
+            await asyncio.sleep(Config.STATS_RECONCILE_INTERVAL)
+    
+    async def archive_conversations(self):
+        """Apply conversation retention, then compress old buckets"""
+        now = datetime.now()
+        if Config.CONVERSATION_RETENTION_DAYS:
+            expired = await self.store.expire(now - timedelta(days=Config.CONVERSATION_RETENTION_DAYS))
+            self.archive_stats["expired"] += expired
+            if expired:
+                log.info(f"🗑️ Deleted {expired} expired conversation {self.store.name}")
+        if Config.CONVERSATION_ARCHIVE_DAYS:
+            archived = await self.store.archive(now - timedelta(days=Config.CONVERSATION_ARCHIVE_DAYS))
+            self.archive_stats["archived"] += archived
+            if archived:
+                log.info(f"🗜️ Compressed {archived} conversation buckets")
+        self.archive_stats["runs"] += 1
+    
+    async def _archive_loop(self):
+        while True:
+            try:
+                await self.archive_conversations()
+            except Exception as e:
+                log.error(f"❌ Conversation archival error: {str(e)[:150]}")
+                self.archive_stats["errors"] += 1
+            await asyncio.sleep(Config.CONVERSATION_ARCHIVE_INTERVAL)
     
     async def get_all_users(self):
         """Get all user IDs"""
         cursor = self.users.find({}, {"user_id": 1})
         return [doc["user_id"] async for doc in cursor]
+    
+    async def iter_user_ids(self, start_from=None, batch_size=500):
+        """Stream reachable user IDs in ascending order, from ``start_from`` on"""
+        query = {"blocked": {"$ne": True}}
+        if start_from is not None:
+            query["user_id"] = {"$gte": start_from}
+        cursor = self.users.find(query, {"user_id": 1, "_id": 0}).sort("user_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            yield doc["user_id"]
+    
+    async def count_reachable_users(self):
+        """Count users not marked as blocked"""
+        return await self.users.count_documents({"blocked": {"$ne": True}})
+    
+    async def mark_blocked(self, user_id):
+        """Mark a user who blocked the bot or deleted their account"""
+        await self.users.update_one(
+            {"user_id": user_id},
+            {"$set": {"blocked": True}}
+        )
+        self._update_cached_user(user_id, {"blocked": True})
+        self._user_changed(user_id)
+    
+    async def create_broadcast(self, job):
+        """Insert a broadcast job, returning its id"""
+        result = await self.broadcasts.insert_one(job)
+        return result.inserted_id
+    
+    async def update_broadcast(self, job_id, fields):
+        """Checkpoint broadcast job state"""
+        fields["updated"] = datetime.now()
+        await self.broadcasts.update_one({"_id": job_id}, {"$set": fields})
+    
+    async def get_broadcast(self, job_id):
+        """Get a broadcast job by id"""
+        return await self.broadcasts.find_one({"_id": job_id})
+    
+    async def get_latest_broadcast(self):
+        """Most recently created broadcast job"""
+        return await self.broadcasts.find_one({}, sort=[("created", -1)])
+    
+    async def get_broadcasts_by_status(self, status):
+        """Broadcast jobs in a given status"""
+        cursor = self.broadcasts.find({"status": status})
+        return await cursor.to_list(length=None)
 
 db = Database()
@@ -1,11 +1,98 @@
 import aiohttp
 from config import Config
+from http_client import http_client
+from cache import TTLCache
+from log_channel import log_pipeline
+from metrics import observe
+from prompt import fit_messages, provider_budget, truncate_to_tokens
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from pyrogram import Client
-from pyrogram.errors import UserNotParticipant
+from pyrogram import Client, enums
+from pyrogram.errors import UserNotParticipant, MessageNotModified, FloodWait
 import random
 import asyncio
 import json
+import logging
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+# Force-sub membership cache: user_id -> is_member
+force_sub_cache = TTLCache(Config.FORCE_SUB_CACHE_SIZE, Config.FORCE_SUB_POSITIVE_TTL)
+_force_sub_inflight = {}
+force_sub_stats = {"lookups": 0, "cache_hits": 0, "coalesced": 0}
+
+
+def _force_sub_channel():
+    return Config.FORCE_SUB_CHANNEL.replace("@", "").replace("https://t.me/", "").strip()
+
+
+def _force_sub_buttons(channel):
+    invite_link = f"https://t.me/{channel}"
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🔔 Join Channel", url=invite_link)],
+        [InlineKeyboardButton("✅ Check Again", callback_data="refresh_sub")]
+    ])
+
+
+async def _fetch_membership(client: Client, channel: str, user_id: int):
+    """Ask Telegram about membership. Returns None when it can't tell."""
+    force_sub_stats["lookups"] += 1
+    try:
+        member = await client.get_chat_member(f"@{channel}", user_id)
+    except UserNotParticipant:
+        return False
+    except Exception:
+        return None
+    
+    return member.status in [
+        enums.ChatMemberStatus.OWNER,
+        enums.ChatMemberStatus.ADMINISTRATOR,
+        enums.ChatMemberStatus.MEMBER
+    ]
+
+
+async def _get_membership(client: Client, channel: str, user_id: int):
+    """Cached, single-flight membership lookup"""
+    is_member = force_sub_cache.get(user_id)
+    if is_member is not None:
+        force_sub_stats["cache_hits"] += 1
+        return is_member
+    
+    # Coalesce a burst from the same user into one Telegram call
+    task = _force_sub_inflight.get(user_id)
+    if task is not None:
+        force_sub_stats["coalesced"] += 1
+        return await asyncio.shield(task)
+    
+    task = asyncio.ensure_future(_fetch_membership(client, channel, user_id))
+    _force_sub_inflight[user_id] = task
+    try:
+        is_member = await asyncio.shield(task)
+    finally:
+        if _force_sub_inflight.get(user_id) is task:
+            del _force_sub_inflight[user_id]
+    
+    # Errors are not cached so the next message retries
+    if is_member is True:
+        force_sub_cache.set(user_id, True, Config.FORCE_SUB_POSITIVE_TTL)
+    elif is_member is False:
+        force_sub_cache.set(user_id, False, Config.FORCE_SUB_NEGATIVE_TTL)
+    return is_member
+
+
+def invalidate_force_sub(user_id: int):
+    """Forget the cached membership of a user (e.g. on 'Check Again')"""
+    force_sub_cache.pop(user_id)
+
+
+def get_force_sub_stats():
+    """Force-sub cache counters, including Telegram calls avoided"""
+    stats = dict(force_sub_stats)
+    stats["calls_avoided"] = stats["cache_hits"] + stats["coalesced"]
+    stats["cached"] = len(force_sub_cache)
+    return stats
 
 
 async def check_force_sub(client: Client, user_id: int):
@@ -16,56 +103,221 @@ async def check_force_sub(client: Client, user_id: int):
     if user_id in Config.OWNER_ID:
         return True, None
     
-    try:
-        channel = Config.FORCE_SUB_CHANNEL.replace("@", "").replace("https://t.me/", "").strip()
-        
-        try:
-            member = await client.get_chat_member(f"@{channel}", user_id)
-        except:
-            return True, None
-        
-        if member.status in ["creator", "administrator", "member"]:
-            return True, None
+    channel = _force_sub_channel()
+    is_member = await _get_membership(client, channel, user_id)
+    
+    # Fail open when Telegram can't tell us
+    if is_member is None or is_member:
+        return True, None
+    
+    return False, _force_sub_buttons(channel)
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker with rolling error-rate and latency.
+    
+    The breaker opens after ``BREAKER_FAILURE_THRESHOLD`` consecutive
+    failures, when the rolling error rate crosses ``BREAKER_ERROR_RATE``, or
+    when a caller trips it explicitly (401, 429, model loading). After the
+    cooldown one trial call is let through (half-open); its outcome closes
+    the breaker or re-opens it with a doubled cooldown.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name):
+        self.name = name
+        self.state = self.CLOSED
+        self.outcomes = deque(maxlen=Config.BREAKER_WINDOW)
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.cooldown = Config.BREAKER_COOLDOWN
+        self.trial_in_flight = False
+    
+    def _refresh(self):
+        if self.state == self.OPEN and time.monotonic() >= self.opened_until:
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+    
+    def available(self):
+        """Would a call be let through right now? (no side effects)"""
+        self._refresh()
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return True
+    
+    def allow(self):
+        """Claim permission for a call (reserves the half-open trial)"""
+        if not self.available():
+            return False
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+        return True
+    
+    def release(self):
+        """Give back a half-open trial whose call was cancelled"""
+        self.trial_in_flight = False
+    
+    def trip(self, cooldown=None):
+        """Open the breaker now, for ``cooldown`` seconds"""
+        if cooldown is None:
+            cooldown = self.cooldown
+        self.state = self.OPEN
+        self.trial_in_flight = False
+        self.opened_until = max(self.opened_until, time.monotonic() + cooldown)
+        log.warning(f"🔌 Breaker OPEN: {self.name} ({cooldown:.0f}s)", extra={"breaker": self.name, "cooldown": cooldown})
+    
+    def record_success(self, latency):
+        self.outcomes.append((True, latency))
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            log.info(f"🔌 Breaker CLOSED: {self.name}", extra={"breaker": self.name})
+        self.state = self.CLOSED
+        self.trial_in_flight = False
+        self.cooldown = Config.BREAKER_COOLDOWN
+    
+    def record_failure(self, latency=None):
+        self.outcomes.append((False, latency))
+        self.consecutive_failures += 1
         
-        invite_link = f"https://t.me/{channel}"
-        buttons = InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔔 Join Channel", url=invite_link)],
-            [InlineKeyboardButton("✅ Check Again", callback_data="refresh_sub")]
-        ])
-        return False, buttons
+        if self.state == self.OPEN:
+            # Already tripped explicitly by the caller
+            return
         
-    except UserNotParticipant:
-        invite_link = f"https://t.me/{channel}"
-        buttons = InlineKeyboardMarkup([
-            [InlineKeyboardButton("🔔 Join Channel", url=invite_link)],
-            [InlineKeyboardButton("✅ Check Again", callback_data="refresh_sub")]
-        ])
-        return False, buttons
-    except:
-        return True, None
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, Config.BREAKER_MAX_COOLDOWN)
+            self.trip()
+        elif (self.consecutive_failures >= Config.BREAKER_FAILURE_THRESHOLD or
+              (len(self.outcomes) >= Config.BREAKER_MIN_SAMPLES and
+               self.error_rate() >= Config.BREAKER_ERROR_RATE)):
+            self.trip()
+    
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok, _ in self.outcomes if not ok) / len(self.outcomes)
+    
+    def avg_latency(self):
+        latencies = [latency for ok, latency in self.outcomes if ok and latency is not None]
+        return sum(latencies) / len(latencies) if latencies else 0.0
+    
+    def health(self):
+        """0..1 score: success rate discounted by average latency (None until sampled)"""
+        if not self.available():
+            return 0.0
+        if len(self.outcomes) < Config.BREAKER_MIN_SAMPLES:
+            return None
+        latency_factor = 1 / (1 + self.avg_latency() / Config.BREAKER_LATENCY_REF)
+        return round((1 - self.error_rate()) * latency_factor, 3)
+    
+    def snapshot(self):
+        self._refresh()
+        return {
+            "name": self.name,
+            "state": self.state,
+            "error_rate": round(self.error_rate(), 3),
+            "avg_latency": round(self.avg_latency(), 3),
+            "health": self.health(),
+            "retry_in": max(0, round(self.opened_until - time.monotonic())) if self.state == self.OPEN else 0
+        }
 
 
-async def get_cohere_response(messages, temperature=0.7):
-    """Cohere AI - FREE & Fast & Reliable"""
+breakers = {}
+
+
+def get_breaker(name):
+    """Breaker for a provider ("Cohere") or HF model ("hf:<model>")"""
+    breaker = breakers.get(name)
+    if breaker is None:
+        breaker = breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def get_breaker_states():
+    """Snapshot of every breaker, for /debug"""
+    return [breaker.snapshot() for breaker in breakers.values()]
+
+
+def get_available_providers():
+    """Configured providers whose breakers would let a call through right now"""
+    providers = []
+    if Config.COHERE_API_KEY and get_breaker("Cohere").available():
+        providers.append("Cohere")
+    if (Config.HUGGINGFACE_API_KEY and get_breaker("Hugging Face").available()
+            and any(get_breaker(f"hf:{m}").available() for m in HF_MODELS)):
+        providers.append("Hugging Face")
+    return providers
+
+
+def _by_health(candidates):
+    """Drop candidates whose breaker is open; keep the configured order, but
+    move ones measured below ``BREAKER_DEMOTE_HEALTH`` behind the rest"""
+    usable = [c for c in candidates if get_breaker(c[0]).available()]
     
-    if not Config.COHERE_API_KEY:
-        print("❌ Cohere: No API key")
+    def demoted(candidate):
+        health = get_breaker(candidate[0]).health()
+        return health is not None and health < Config.BREAKER_DEMOTE_HEALTH
+    
+    return [c for c in usable if not demoted(c)] + [c for c in usable if demoted(c)]
+
+
+async def _guarded(name, factory):
+    """Run a provider call under its circuit breaker"""
+    breaker = get_breaker(name)
+    if not breaker.allow():
         return None
     
+    started = time.monotonic()
+    try:
+        text = await factory()
+    except asyncio.CancelledError:
+        # Lost a hedged race: neither a success nor a failure
+        breaker.release()
+        observe("ai_provider_seconds", time.monotonic() - started, provider=name, outcome="cancelled")
+        raise
+    except Exception:
+        elapsed = time.monotonic() - started
+        breaker.record_failure(elapsed)
+        observe("ai_provider_seconds", elapsed, provider=name, outcome="error")
+        raise
+    
+    elapsed = time.monotonic() - started
+    if text:
+        breaker.record_success(elapsed)
+    else:
+        breaker.record_failure(elapsed)
+    observe("ai_provider_seconds", elapsed, provider=name, outcome="ok" if text else "empty")
+    return text
+
+
+def _retry_after(response, default):
+    """Seconds from a Retry-After header, falling back to ``default``"""
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _build_cohere_request(messages, temperature, stream=False):
+    """Flatten chat messages into a Cohere /v1/generate request"""
+    
+    # Keep the prompt inside Cohere's context budget
+    messages = fit_messages(messages, provider_budget("Cohere"))
+    
     # Build conversation prompt
     conversation = ""
-    user_msg = ""
-    system_prompt = ""
     
     for msg in messages:
         role = msg.get("role", "")
         content = msg.get("content", "")
         
         if role == "system":
-            system_prompt = content
             conversation += f"{content}\n\n"
         elif role == "user":
-            user_msg = content
             conversation += f"User: {content}\n"
         elif role == "assistant":
             conversation += f"Assistant: {content}\n"
@@ -89,79 +341,267 @@ async def get_cohere_response(messages, temperature=0.7):
         "stop_sequences": ["User:", "\nUser", "Human:"],
         "return_likelihoods": "NONE"
     }
+    if stream:
+        payload["stream"] = True
+    
+    return headers, payload
+
+
+def _clean_cohere_text(text):
+    """Strip leaked prompt/role markers from generated text"""
+    text = text.strip()
+    
+    # Remove any remaining prompt text
+    if "Assistant:" in text:
+        text = text.split("Assistant:")[-1].strip()
+    
+    # Remove user prompts if leaked
+    if "User:" in text:
+        text = text.split("User:")[0].strip()
+    
+    if "\nUser" in text:
+        text = text.split("\nUser")[0].strip()
+    
+    return text
+
+
+async def _handle_cohere_error(status, response):
+    """Log a non-200 Cohere response and trip the breaker where useful"""
+    if status == 401:
+        log.error("❌ Cohere: Invalid API key (401)")
+        get_breaker("Cohere").trip(Config.BREAKER_AUTH_COOLDOWN)
+    
+    elif status == 429:
+        log.warning("⏳ Cohere: Rate limit exceeded")
+        get_breaker("Cohere").trip(_retry_after(response, Config.BREAKER_COOLDOWN))
+    
+    else:
+        error = await response.text()
+        log.warning(f"❌ Cohere Error {status}: {error[:200]}", extra={"status": status})
+
+
+async def get_cohere_response(messages, temperature=0.7):
+    """Cohere AI - FREE & Fast & Reliable"""
+    
+    if not Config.COHERE_API_KEY:
+        log.debug("❌ Cohere: No API key")
+        return None
+    
+    headers, payload = _build_cohere_request(messages, temperature)
+    
+    try:
+        log.debug("🔄 Trying Cohere...")
+        
+        session = await http_client.get_session()
+        async with session.post(
+            f"{Config.COHERE_BASE_URL}/v1/generate",
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=Config.COHERE_TIMEOUT)
+        ) as response:
+            
+            status = response.status
+            log.debug(f"📡 Cohere Status: {status}", extra={"status": status})
+            
+            if status != 200:
+                await _handle_cohere_error(status, response)
+                return None
+            
+            data = await response.json()
+            
+            if "generations" in data and len(data["generations"]) > 0:
+                text = _clean_cohere_text(data["generations"][0]["text"])
+                
+                # Validate response
+                if len(text) > 5:
+                    log.debug(f"✅ Cohere Success! Response: {text[:50]}...")
+                    return text
+                else:
+                    log.debug(f"⚠️ Cohere response too short: {text}")
+                    return None
+            
+            else:
+                log.warning("⚠️ Cohere: No generations in response")
+                return None
+    
+    except asyncio.TimeoutError:
+        log.warning("⏰ Cohere: Request timeout")
+        return None
+    
+    except Exception as e:
+        log.warning(f"❌ Cohere Exception: {str(e)[:150]}")
+        return None
+
+
+async def get_cohere_stream_response(messages, temperature=0.7, on_partial=None):
+    """Cohere with streamed tokens.
+    
+    ``on_partial`` is awaited with the cleaned text generated so far each
+    time a new chunk arrives. Returns the final text like
+    ``get_cohere_response``.
+    """
+    
+    if not Config.COHERE_API_KEY:
+        log.debug("❌ Cohere: No API key")
+        return None
+    
+    headers, payload = _build_cohere_request(messages, temperature, stream=True)
     
     try:
-        print("🔄 Trying Cohere...")
+        log.debug("🔄 Trying Cohere (stream)...")
+        
+        session = await http_client.get_session()
+        async with session.post(
+            f"{Config.COHERE_BASE_URL}/v1/generate",
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=Config.COHERE_TIMEOUT)
+        ) as response:
+            
+            status = response.status
+            log.debug(f"📡 Cohere Status: {status}", extra={"status": status})
+            
+            if status != 200:
+                await _handle_cohere_error(status, response)
+                return None
+            
+            # Newline-delimited JSON: {"text": ..., "is_finished": false} ...
+            generated = ""
+            async for line in response.content:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                
+                if event.get("is_finished"):
+                    break
+                
+                chunk = event.get("text")
+                if not chunk:
+                    continue
+                generated += chunk
+                
+                partial = _clean_cohere_text(generated)
+                if on_partial and partial:
+                    try:
+                        await on_partial(partial)
+                    except Exception as e:
+                        log.warning(f"⚠️ Stream update failed: {str(e)[:100]}")
+            
+            text = _clean_cohere_text(generated)
+            if len(text) > 5:
+                log.debug(f"✅ Cohere Stream Success! Response: {text[:50]}...")
+                return text
+            
+            log.debug(f"⚠️ Cohere response too short: {text}")
+            return None
+    
+    except asyncio.TimeoutError:
+        log.warning("⏰ Cohere: Request timeout")
+        return None
+    
+    except Exception as e:
+        log.warning(f"❌ Cohere Exception: {str(e)[:150]}")
+        return None
+
+
+# Fast-loading models
+HF_MODELS = [
+    "google/flan-t5-base",
+    "microsoft/DialoGPT-medium",
+    "facebook/blenderbot-400M-distill"
+]
+
+
+async def _get_hf_model_response(model_name, user_msg, headers):
+    """Query a single Hugging Face model"""
+    log.debug(f"🔄 Trying HF: {model_name}", extra={"model": model_name})
+    
+    try:
+        payload = {
+            "inputs": user_msg,
+            "parameters": {
+                "max_new_tokens": 100,
+                "temperature": 0.7,
+                "return_full_text": False
+            },
+            "options": {
+                "wait_for_model": True,
+                "use_cache": True
+            }
+        }
+        
+        url = f"{Config.HF_BASE_URL}/models/{model_name}"
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.cohere.ai/v1/generate",
-                headers=headers,
-                json=payload,
-                timeout=aiohttp.ClientTimeout(total=30)
-            ) as response:
+        session = await http_client.get_session()
+        async with session.post(
+            url,
+            headers=headers,
+            json=payload,
+            timeout=aiohttp.ClientTimeout(total=Config.HF_TIMEOUT)
+        ) as response:
                 
-                status = response.status
-                print(f"📡 Cohere Status: {status}")
+            status = response.status
+            log.debug(f"📡 HF Status: {status}", extra={"model": model_name, "status": status})
                 
-                if status == 200:
-                    data = await response.json()
-                    print(f"📦 Cohere Response received")
+            if status == 200:
+                data = await response.json()
                     
-                    if "generations" in data and len(data["generations"]) > 0:
-                        text = data["generations"][0]["text"].strip()
-                        
-                        # Clean response
-                        # Remove any remaining prompt text
-                        if "Assistant:" in text:
-                            text = text.split("Assistant:")[-1].strip()
-                        
-                        # Remove user prompts if leaked
-                        if "User:" in text:
-                            text = text.split("User:")[0].strip()
+                # Parse response
+                text = None
+                    
+                if isinstance(data, list) and len(data) > 0:
+                    if isinstance(data[0], dict):
+                        text = data[0].get("generated_text") or data[0].get("summary_text") or data[0].get("text")
+                    elif isinstance(data[0], str):
+                        text = data[0]
+                    
+                elif isinstance(data, dict):
+                    text = data.get("generated_text") or data.get("text") or data.get("summary_text")
+                    
+                if text:
+                    text = str(text).strip()
                         
-                        if "\nUser" in text:
-                            text = text.split("\nUser")[0].strip()
+                    if user_msg.lower() in text.lower():
+                        text = text.replace(user_msg, "").strip()
                         
-                        # Validate response
-                        if len(text) > 5:
-                            print(f"✅ Cohere Success! Response: {text[:50]}...")
-                            return text
-                        else:
-                            print(f"⚠️ Cohere response too short: {text}")
-                            return None
-                    
-                    else:
-                        print("⚠️ Cohere: No generations in response")
-                        return None
-                
-                elif status == 401:
-                    print("❌ Cohere: Invalid API key (401)")
-                    return None
+                    if len(text) > 5:
+                        log.debug("✅ HF Success!", extra={"model": model_name})
+                        return text
                 
-                elif status == 429:
-                    print("⏳ Cohere: Rate limit exceeded")
-                    return None
+            elif status == 503:
+                # Model loading: skip this model until it should be warm
+                # instead of sleeping inside the request
+                wait = Config.BREAKER_COOLDOWN
+                try:
+                    error_data = await response.json()
+                    wait = float(error_data.get("estimated_time", wait))
+                except:
+                    pass
+                log.info(f"⏳ HF model loading, skipping {model_name} for {wait:.0f}s", extra={"model": model_name})
+                get_breaker(f"hf:{model_name}").trip(wait)
                 
-                else:
-                    error = await response.text()
-                    print(f"❌ Cohere Error {status}: {error[:200]}")
-                    return None
+            else:
+                error_text = await response.text()
+                log.warning(f"❌ HF Error {status}: {error_text[:100]}", extra={"model": model_name, "status": status})
     
     except asyncio.TimeoutError:
-        print("⏰ Cohere: Request timeout")
-        return None
+        log.warning(f"⏰ HF Timeout: {model_name}", extra={"model": model_name})
     
     except Exception as e:
-        print(f"❌ Cohere Exception: {str(e)[:150]}")
-        return None
+        log.warning(f"❌ HF Exception: {str(e)[:100]}", extra={"model": model_name})
+    
+    return None
 
 
 async def get_huggingface_response(messages, temperature=0.7):
     """Hugging Face API - FREE backup"""
     
     if not Config.HUGGINGFACE_API_KEY:
-        print("❌ HF: No API key")
+        log.debug("❌ HF: No API key")
         return None
     
     # Extract user message
@@ -174,135 +614,196 @@ async def get_huggingface_response(messages, temperature=0.7):
     if not user_msg:
         return None
     
-    print(f"🔵 HF User Message: {user_msg}")
+    user_msg = truncate_to_tokens(user_msg, provider_budget("Hugging Face"))
+    log.debug(f"🔵 HF User Message: {user_msg}")
     
     headers = {
         "Authorization": f"Bearer {Config.HUGGINGFACE_API_KEY}",
         "Content-Type": "application/json"
     }
     
-    # Fast-loading models
-    models = [
-        "google/flan-t5-base",
-        "microsoft/DialoGPT-medium",
-        "facebook/blenderbot-400M-distill"
-    ]
+    candidates = _by_health([
+        (f"hf:{model_name}", lambda model_name=model_name: _guarded(
+            f"hf:{model_name}", lambda: _get_hf_model_response(model_name, user_msg, headers)
+        ))
+        for model_name in HF_MODELS
+    ])
     
-    for model_name in models:
-        print(f"🔄 Trying HF: {model_name}")
-        
-        try:
-            payload = {
-                "inputs": user_msg,
-                "parameters": {
-                    "max_new_tokens": 100,
-                    "temperature": 0.7,
-                    "return_full_text": False
-                },
-                "options": {
-                    "wait_for_model": True,
-                    "use_cache": True
-                }
-            }
+    if Config.AI_DISPATCH_MODE == "hedged":
+        winner, text = await _hedged_race(candidates, Config.AI_HEDGE_DELAY)
+    else:
+        winner, text = await _sequential(candidates)
+    
+    if text:
+        return text
+    
+    log.warning("❌ HF: All models failed")
+    return None
+
+
+async def _sequential(candidates):
+    """Try (name, factory) candidates one after another"""
+    for name, factory in candidates:
+        text = await factory()
+        if text:
+            return name, text
+    return None, None
+
+
+async def _hedged_race(candidates, hedge_delay, progress=None):
+    """Hedged dispatch over (name, factory) candidates.
+    
+    Starts the first candidate and launches the next one whenever nothing
+    has answered within ``hedge_delay`` seconds (or a running one fails).
+    The first valid response wins and everything still running is cancelled.
+    If ``progress`` (an asyncio.Event) is set, a running candidate is
+    already streaming, so no further hedges are launched.
+    """
+    queue = list(candidates)
+    pending = {}
+    
+    def launch():
+        name, factory = queue.pop(0)
+        pending[asyncio.ensure_future(factory())] = name
+    
+    try:
+        while pending or queue:
+            if not pending:
+                launch()
             
-            url = f"https://api-inference.huggingface.co/models/{model_name}"
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if queue else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=60)
-                ) as response:
-                    
-                    status = response.status
-                    print(f"📡 HF Status: {status}")
-                    
-                    if status == 200:
-                        data = await response.json()
-                        
-                        # Parse response
-                        text = None
-                        
-                        if isinstance(data, list) and len(data) > 0:
-                            if isinstance(data[0], dict):
-                                text = data[0].get("generated_text") or data[0].get("summary_text") or data[0].get("text")
-                            elif isinstance(data[0], str):
-                                text = data[0]
-                        
-                        elif isinstance(data, dict):
-                            text = data.get("generated_text") or data.get("text") or data.get("summary_text")
-                        
-                        if text:
-                            text = str(text).strip()
-                            
-                            if user_msg.lower() in text.lower():
-                                text = text.replace(user_msg, "").strip()
-                            
-                            if len(text) > 5:
-                                print(f"✅ HF Success!")
-                                return text
-                    
-                    elif status == 503:
-                        # Model loading
-                        try:
-                            error_data = await response.json()
-                            if "estimated_time" in error_data:
-                                wait = min(error_data["estimated_time"], 20)
-                                print(f"⏳ HF waiting {wait}s...")
-                                await asyncio.sleep(wait)
-                                continue
-                        except:
-                            pass
-                    
-                    else:
-                        error_text = await response.text()
-                        print(f"❌ HF Error {status}: {error_text[:100]}")
-        
-        except asyncio.TimeoutError:
-            print(f"⏰ HF Timeout: {model_name}")
-            continue
+            if not done:
+                # Hedge: primary is slow, start the backup alongside it
+                if progress is None or not progress.is_set():
+                    launch()
+                continue
+            
+            for task in done:
+                name = pending.pop(task)
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                text = task.result()
+                if text:
+                    return name, text
         
-        except Exception as e:
-            print(f"❌ HF Exception: {str(e)[:100]}")
-            continue
+        return None, None
     
-    print("❌ HF: All models failed")
-    return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Per-provider win counts and latency across all AI requests
+ai_stats = {
+    "requests": 0,
+    "failures": 0,
+    "wins": {},
+    "latency": {}
+}
+
+
+def _record_ai_result(provider, elapsed):
+    ai_stats["requests"] += 1
+    if provider is None:
+        ai_stats["failures"] += 1
+        return
+    ai_stats["wins"][provider] = ai_stats["wins"].get(provider, 0) + 1
+    ai_stats["latency"][provider] = ai_stats["latency"].get(provider, 0.0) + elapsed
+
 
+def get_ai_stats():
+    """Which providers won and their average latency"""
+    providers = {
+        provider: {
+            "wins": wins,
+            "avg_latency": round(ai_stats["latency"][provider] / wins, 3)
+        }
+        for provider, wins in ai_stats["wins"].items()
+    }
+    return {
+        "requests": ai_stats["requests"],
+        "failures": ai_stats["failures"],
+        "providers": providers
+    }
 
-async def get_ai_response(messages, temperature=0.7):
-    """Main AI function - Tries Cohere first, then HuggingFace"""
+
+async def get_cohere_only_response(messages, temperature=0.7):
+    """Cohere under its circuit breaker, without falling back to Hugging Face.
     
-    print(f"\n{'='*60}")
-    print(f"🤖 AI REQUEST START")
-    print(f"{'='*60}")
+    For instruction-following jobs (memory summaries) the HF chat models
+    cannot do; returns None when Cohere is unavailable or fails.
+    """
+    if not Config.COHERE_API_KEY:
+        return None
+    return await _guarded("Cohere", lambda: get_cohere_response(messages, temperature))
+
+
+async def get_ai_response(messages, temperature=0.7, meta=None, on_partial=None):
+    """Main AI function - Cohere first, Hugging Face as (hedged) backup
     
-    response = None
+    If ``meta`` is a dict it is filled with the winning provider and the
+    request latency in seconds. If ``on_partial`` is given and streaming is
+    enabled, Cohere streams and ``on_partial`` receives the text so far.
+    """
+    
+    candidates = []
+    progress = None
     
     # Priority 1: Cohere (Fast, Reliable, FREE)
-    if Config.COHERE_API_KEY:
-        response = await get_cohere_response(messages, temperature)
-        if response:
-            print(f"✅ SUCCESS - Used: Cohere")
-            print(f"{'='*60}\n")
-            return response
-        else:
-            print("⚠️ Cohere failed, trying backup...")
-    
-    # Priority 2: Hugging Face (Backup)
-    if Config.HUGGINGFACE_API_KEY:
-        response = await get_huggingface_response(messages, temperature)
-        if response:
-            print(f"✅ SUCCESS - Used: Hugging Face")
-            print(f"{'='*60}\n")
-            return response
-        else:
-            print("⚠️ Hugging Face failed")
+    if Config.COHERE_API_KEY and on_partial and Config.STREAM_RESPONSES:
+        progress = asyncio.Event()
+        
+        async def on_cohere_partial(text):
+            progress.set()
+            await on_partial(text)
+        
+        candidates.append(("Cohere", lambda: _guarded(
+            "Cohere", lambda: get_cohere_stream_response(messages, temperature, on_cohere_partial)
+        )))
+    elif Config.COHERE_API_KEY:
+        candidates.append(("Cohere", lambda: _guarded(
+            "Cohere", lambda: get_cohere_response(messages, temperature)
+        )))
+    
+    # Priority 2: Hugging Face (Backup), only while one of its models is usable
+    if Config.HUGGINGFACE_API_KEY and any(get_breaker(f"hf:{m}").available() for m in HF_MODELS):
+        candidates.append(("Hugging Face", lambda: _guarded(
+            "Hugging Face", lambda: get_huggingface_response(messages, temperature)
+        )))
+    
+    # Skip open circuits, try unhealthy providers last
+    candidates = _by_health(candidates)
+    
+    started = time.monotonic()
+    if Config.AI_DISPATCH_MODE == "hedged":
+        provider, response = await _hedged_race(candidates, Config.AI_HEDGE_DELAY, progress)
+    else:
+        provider, response = await _sequential(candidates)
+    elapsed = time.monotonic() - started
+    
+    if candidates:
+        _record_ai_result(provider, elapsed)
+    if meta is not None:
+        meta["provider"] = provider
+        meta["latency"] = elapsed
+    
+    if response:
+        log.debug(
+            f"✅ AI response from {provider} ({elapsed:.2f}s)",
+            extra={"provider": provider, "latency": round(elapsed, 3), "mode": Config.AI_DISPATCH_MODE}
+        )
+        return response
     
     # All providers failed
-    print(f"❌ ALL AI PROVIDERS FAILED")
-    print(f"{'='*60}\n")
+    log.warning(
+        "❌ All AI providers failed",
+        extra={"latency": round(elapsed, 3), "mode": Config.AI_DISPATCH_MODE}
+    )
     
     # Check if any API key is configured
     if not Config.COHERE_API_KEY and not Config.HUGGINGFACE_API_KEY:
@@ -394,12 +895,96 @@ def get_random_reaction():
     return random.choice(reactions)
 
 
-async def send_to_log_channel(client: Client, message_text: str):
-    """Send message to log channel"""
+class StreamingReply:
+    """Reply that grows as a streamed generation arrives.
+    
+    The first partial text is sent as a reply right away; later updates are
+    coalesced into at most one ``edit_text`` per ``STREAM_EDIT_INTERVAL``
+    seconds to stay inside Telegram's edit limits.
+    """
+    
+    CURSOR = " ▌"
+    
+    def __init__(self, message):
+        self.message = message
+        self.sent = None
+        self.text = ""
+        self.shown = ""
+        self.last_edit = 0.0
+        self._flush_task = None
+        # True while a partial edit is on its way to Telegram
+        self._editing = False
+    
+    async def update(self, text):
+        """Record the latest partial text and show it when allowed"""
+        self.text = text
+        
+        if self.sent is None:
+            self.sent = await self.message.reply(text + self.CURSOR)
+            self.shown = text
+            self.last_edit = time.monotonic()
+            return
+        
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._delayed_flush())
+    
+    async def _delayed_flush(self):
+        try:
+            wait = self.last_edit + Config.STREAM_EDIT_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if len(self.text) - len(self.shown) >= Config.STREAM_MIN_CHARS:
+                self._editing = True
+                await self._edit(self.text + self.CURSOR)
+        except FloodWait as e:
+            # Back off further partial edits; the final edit still goes through
+            self.last_edit = time.monotonic() + e.value
+        except Exception as e:
+            log.warning(f"⚠️ Stream edit failed: {str(e)[:100]}")
+        finally:
+            # Cleared only now, so finish() can wait for an edit in flight
+            self._editing = False
+            self._flush_task = None
+    
+    async def _edit(self, text):
+        try:
+            await self.sent.edit_text(text)
+        except MessageNotModified:
+            pass
+        self.shown = text.replace(self.CURSOR, "")
+        self.last_edit = time.monotonic()
+    
+    async def finish(self, text):
+        """Show the final text (a plain reply if nothing was streamed)"""
+        task = self._flush_task
+        if task is not None:
+            # A partial edit already sent must land before the final one;
+            # one still waiting for its slot is dropped
+            if not self._editing:
+                task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        
+        if self.sent is None:
+            self.sent = await self.message.reply(text)
+            return self.sent
+        
+        try:
+            try:
+                await self._edit(text)
+            except FloodWait as e:
+                await asyncio.sleep(e.value)
+                await self._edit(text)
+        except Exception:
+            # Fall back to a fresh message if the edit can't go through
+            self.sent = await self.message.reply(text)
+        return self.sent
+
+
+async def send_to_log_channel(client: Client, message_text: str, kind: str = "event"):
+    """Queue a message for the log channel (batched, never blocks the caller)"""
     if not Config.LOG_CHANNEL:
         return
     
-    try:
-        await client.send_message(Config.LOG_CHANNEL, message_text)
-    except Exception as e:
-        print(f"Log channel error: {e}")
+    if log_pipeline.client is None:
+        log_pipeline.start(client)
+    log_pipeline.submit(message_text, kind)
@@ -0,0 +1,101 @@
+import aiohttp
+from config import Config
+
+
+class ProviderHTTPClient:
+    """Shared aiohttp session for the AI providers.
+
+    One keep-alive connection pool lives for the whole bot lifecycle, so
+    replies reuse warm TCP/TLS connections instead of opening a new session
+    (and doing a fresh DNS lookup + handshake) for every message.
+    """
+
+    def __init__(self):
+        self.session = None
+        self.connector = None
+        self.stats = {
+            "requests": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0
+        }
+
+    def _trace_config(self):
+        """Hook aiohttp tracing to count pool reuse and DNS cache hits"""
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.stats["connections_reused"] += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.stats["dns_cache_hits"] += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.stats["dns_cache_misses"] += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    async def start(self):
+        """Create the pooled session (must run inside the event loop)"""
+        if self.session and not self.session.closed:
+            return self.session
+
+        self.connector = aiohttp.TCPConnector(
+            limit=Config.HTTP_POOL_LIMIT,
+            limit_per_host=Config.HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=Config.HTTP_DNS_TTL,
+            use_dns_cache=True,
+            keepalive_timeout=Config.HTTP_KEEPALIVE_TIMEOUT
+        )
+        self.session = aiohttp.ClientSession(
+            connector=self.connector,
+            timeout=aiohttp.ClientTimeout(
+                total=Config.HTTP_TOTAL_TIMEOUT,
+                connect=Config.HTTP_CONNECT_TIMEOUT
+            ),
+            trace_configs=[self._trace_config()]
+        )
+        return self.session
+
+    async def close(self):
+        """Close the session and every pooled connection"""
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.connector = None
+
+    async def get_session(self):
+        """Return the shared session, creating it lazily if needed"""
+        if not self.session or self.session.closed:
+            await self.start()
+        return self.session
+
+    def pool_stats(self):
+        """Current pool usage plus lifetime counters"""
+        stats = dict(self.stats)
+        connector = self.connector
+        if connector and not connector.closed:
+            stats["in_use"] = len(connector._acquired)
+            stats["idle"] = sum(len(conns) for conns in connector._conns.values())
+            stats["limit"] = connector.limit
+            stats["limit_per_host"] = connector.limit_per_host
+        else:
+            stats["in_use"] = stats["idle"] = 0
+            stats["limit"] = Config.HTTP_POOL_LIMIT
+            stats["limit_per_host"] = Config.HTTP_POOL_LIMIT_PER_HOST
+        return stats
+
+
+http_client = ProviderHTTPClient()
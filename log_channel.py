@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import random
+from collections import deque
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+from config import Config
+
+log = logging.getLogger(__name__)
+
+# Telegram's limit for one text message
+MAX_MESSAGE_LENGTH = 4096
+SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+
+
+class LogChannelPipeline:
+    """Batched, non-blocking log channel sender.
+
+    Events go into a bounded queue and a background task packs as many as
+    fit into one Telegram message every ``LOG_FLUSH_INTERVAL`` seconds.
+    Under load, "chat" events are sampled and a full queue drops events
+    (``LOG_DROP_POLICY``: "newest" or "oldest"), so logging never makes a
+    user wait.
+    """
+
+    def __init__(self):
+        self.client = None
+        self.queue = deque()
+        self._task = None
+        self.stats = {
+            "enqueued": 0,
+            "sent_events": 0,
+            "sent_messages": 0,
+            "dropped_full": 0,
+            "dropped_sampled": 0,
+            "send_errors": 0
+        }
+
+    def start(self, client: Client):
+        self.client = client
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def submit(self, text, kind="event"):
+        """Queue an event without waiting; returns False if it was dropped"""
+        depth = len(self.queue)
+
+        if kind == "chat" and depth >= Config.LOG_SAMPLE_THRESHOLD:
+            if random.random() >= Config.LOG_SAMPLE_RATE:
+                self.stats["dropped_sampled"] += 1
+                return False
+
+        if depth >= Config.LOG_QUEUE_MAX:
+            self.stats["dropped_full"] += 1
+            if Config.LOG_DROP_POLICY != "oldest":
+                return False
+            self.queue.popleft()
+
+        self.queue.append(text[:MAX_MESSAGE_LENGTH])
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(Config.LOG_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.warning(f"Log channel error: {e}")
+
+    def _next_batch(self):
+        """Pop as many queued events as fit in one message"""
+        events = [self.queue.popleft()]
+        length = len(events[0])
+        while self.queue and length + len(SEPARATOR) + len(self.queue[0]) <= MAX_MESSAGE_LENGTH:
+            event = self.queue.popleft()
+            length += len(SEPARATOR) + len(event)
+            events.append(event)
+        return events
+
+    async def flush(self):
+        """Send everything queued, one packed message at a time"""
+        if not self.client or not Config.LOG_CHANNEL:
+            return
+
+        while self.queue:
+            events = self._next_batch()
+            try:
+                await self.client.send_message(Config.LOG_CHANNEL, SEPARATOR.join(events))
+            except FloodWait as e:
+                # Keep the batch and try again after the wait
+                self.queue.extendleft(reversed(events))
+                await asyncio.sleep(e.value)
+                continue
+            except Exception as e:
+                log.warning(f"Log channel error: {e}")
+                self.stats["send_errors"] += 1
+                continue
+
+            self.stats["sent_messages"] += 1
+            self.stats["sent_events"] += len(events)
+
+
+log_pipeline = LogChannelPipeline()
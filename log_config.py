@@ -0,0 +1,104 @@
+import json
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from config import Config
+from ratelimit import TokenBucket
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+dropped = 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra=`` fields (provider, latency...) become keys"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keep a random ``LOG_DEBUG_SAMPLE_RATE`` share of DEBUG lines, capped at
+    ``LOG_DEBUG_MAX_PER_SEC``. INFO and above always pass."""
+
+    def __init__(self, rate, max_per_sec):
+        super().__init__()
+        self.rate = rate
+        self.bucket = TokenBucket(max_per_sec, max_per_sec)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        return random.random() < self.rate and self.bucket.try_acquire()
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never block the event loop: a full queue drops the record"""
+
+    def enqueue(self, record):
+        global dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped += 1
+
+
+def setup_logging():
+    """Route all logging through a queue to a background writer thread.
+
+    The event loop only formats the message and enqueues it; the stdout
+    write happens on the listener thread. Levels are ``LOG_LEVEL`` plus
+    per-module overrides in ``LOG_LEVELS`` ("helpers=DEBUG,database=WARNING").
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if Config.LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname).1s %(name)s: %(message)s"))
+
+    handler = _DroppingQueueHandler(queue.Queue(Config.LOG_BUFFER_MAX))
+    handler.addFilter(DebugSampler(Config.LOG_DEBUG_SAMPLE_RATE, Config.LOG_DEBUG_MAX_PER_SEC))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(Config.LOG_LEVEL.upper())
+
+    for item in Config.LOG_LEVELS.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    # Library chatter stays at WARNING unless asked for
+    for name in ("pyrogram", "aiohttp.access"):
+        if name not in Config.LOG_LEVELS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from config import Config
+
+log = logging.getLogger(__name__)
+
+
+class _Mailbox:
+    __slots__ = ("jobs", "busy", "last_used")
+
+    def __init__(self):
+        self.jobs = deque()
+        self.busy = False
+        self.last_used = time.monotonic()
+
+
+class Mailboxes:
+    """Keyed mailboxes: jobs for one key run one at a time, in order.
+
+    Handlers ``post`` work and return at once, so Pyrogram's few handler
+    workers only route updates. Each key (a user) has its own FIFO drained
+    by one task, which keeps a user's turns from racing on history and
+    saves, while up to ``MAILBOX_CONCURRENCY`` users run at once. Empty
+    mailboxes idle for ``MAILBOX_IDLE_TTL`` seconds are dropped by the
+    sweep, so memory tracks active users only.
+    """
+
+    def __init__(self, concurrency, idle_ttl):
+        self.concurrency = concurrency
+        self.idle_ttl = idle_ttl
+        self.boxes = {}
+        self.running = 0
+        self.posted = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+        self._slots = None
+        self._drains = set()
+        self._task = None
+        self._closed = False
+
+    def post(self, key, factory):
+        """Run ``factory()`` after every earlier job for ``key``; returns a future for its result"""
+        future = asyncio.get_running_loop().create_future()
+        # Failures are logged in _run; callers don't have to await the future
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if self._closed:
+            future.cancel()
+            return future
+
+        box = self.boxes.get(key)
+        if box is None:
+            box = self.boxes[key] = _Mailbox()
+        box.jobs.append((factory, future))
+        box.last_used = time.monotonic()
+        self.posted += 1
+
+        if not box.busy:
+            box.busy = True
+            task = asyncio.ensure_future(self._drain(box))
+            self._drains.add(task)
+            task.add_done_callback(self._drains.discard)
+        return future
+
+    async def _drain(self, box):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        try:
+            while box.jobs:
+                factory, future = box.jobs.popleft()
+                async with self._slots:
+                    await self._run(factory, future)
+                box.last_used = time.monotonic()
+        finally:
+            box.busy = False
+            # Jobs left behind by a cancelled drain will never run
+            while box.jobs:
+                box.jobs.popleft()[1].cancel()
+
+    async def _run(self, factory, future):
+        self.running += 1
+        try:
+            result = await factory()
+            if not future.done():
+                future.set_result(result)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            log.exception(f"❌ Mailbox job failed: {e}")
+            if not future.done():
+                future.set_exception(e)
+        finally:
+            self.running -= 1
+            self.completed += 1
+
+    def sweep(self):
+        """Drop empty mailboxes idle for longer than ``idle_ttl``"""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [
+            key for key, box in self.boxes.items()
+            if not box.busy and not box.jobs and box.last_used < cutoff
+        ]
+        for key in idle:
+            del self.boxes[key]
+        self.expired += len(idle)
+        return len(idle)
+
+    def start(self):
+        self._closed = False
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._sweep_loop(max(1, self.idle_ttl / 2)))
+
+    async def _sweep_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    async def stop(self, timeout=10):
+        """Refuse new jobs, give running ones ``timeout`` seconds, cancel the rest"""
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        drains = list(self._drains)
+        if drains:
+            _, pending = await asyncio.wait(drains, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self.boxes.clear()
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "queued": sum(len(box.jobs) for box in self.boxes.values()),
+            "boxes": len(self.boxes),
+            "busy": sum(1 for box in self.boxes.values() if box.busy),
+            "posted": self.posted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired
+        }
+
+
+# Per-user conversation turns
+mailboxes = Mailboxes(Config.MAILBOX_CONCURRENCY, Config.MAILBOX_IDLE_TTL)
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from datetime import datetime
+from config import Config
+from database import db
+from helpers import get_breaker, get_cohere_only_response
+from prompt import truncate_to_tokens
+from ratelimit import ai_limiter
+from scheduler import ai_scheduler
+
+log = logging.getLogger(__name__)
+
+# user_id -> running summary task (at most one per user)
+_summary_tasks = {}
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep a short long-term memory of a chat between a user and their AI companion. "
+    "Update the memory with the new conversation: keep names, preferences, plans, feelings "
+    "and important events; drop small talk. Reply with the updated memory only, "
+    f"in under {Config.SUMMARY_MAX_WORDS} words."
+)
+
+
+def schedule_summary(user_id, memory, dropped):
+    """Fold turns that fell out of the prompt into ``users.memory`` in the background.
+
+    Only turns newer than ``memory["summarized_until"]`` are used, and
+    nothing runs until at least ``SUMMARY_MIN_TURNS`` new ones are waiting.
+    Summaries come from Cohere only: the HF fallbacks answer with chat text,
+    which would end up in every later prompt as the user's memory.
+    """
+    if not Config.SUMMARY_ENABLED or not Config.COHERE_API_KEY or user_id in _summary_tasks:
+        return
+    if not get_breaker("Cohere").available():
+        # Turns stay unsummarized until Cohere is back
+        return
+
+    summarized_until = (memory or {}).get("summarized_until")
+    new_turns = [
+        turn for turn in dropped
+        if summarized_until is None or turn["timestamp"] > summarized_until
+    ]
+    if len(new_turns) < Config.SUMMARY_MIN_TURNS:
+        return
+
+    task = asyncio.ensure_future(_update_summary(user_id, memory or {}, new_turns))
+    _summary_tasks[user_id] = task
+    task.add_done_callback(lambda _: _summary_tasks.pop(user_id, None))
+
+
+async def _update_summary(user_id, memory, turns):
+    conversation = "\n".join(
+        f"User: {truncate_to_tokens(turn['user_message'], 150)}\n"
+        f"Assistant: {truncate_to_tokens(turn['bot_response'], 150)}"
+        for turn in turns
+    )
+    messages = [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": (
+            f"Current memory: {memory.get('summary') or 'Nothing yet.'}\n\n"
+            f"New conversation:\n{conversation}"
+        )}
+    ]
+
+    if not ai_limiter.try_acquire():
+        # Global provider budget spent: replies come first, retry on a later turn
+        return
+
+    try:
+        summary = await ai_scheduler.run(
+            user_id, lambda: get_cohere_only_response(messages, temperature=0.3)
+        )
+        if not summary:
+            # Cohere unavailable: keep the turns for the next attempt
+            return
+
+        # /reset while we were summarizing: these turns are forgotten
+        user = await db.get_user(user_id)
+        reset_at = user.get("history_reset_at") if user else None
+        if reset_at and turns[-1]["timestamp"] <= reset_at:
+            return
+
+        await db.update_memory(user_id, {
+            "summary": truncate_to_tokens(summary.strip(), Config.SUMMARY_MAX_WORDS * 2),
+            "summarized_until": turns[-1]["timestamp"],
+            "updated": datetime.now()
+        })
+    except Exception as e:
+        log.warning(f"❌ Memory summary error: {str(e)[:150]}")
@@ -0,0 +1,141 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cache hit to a slow provider call
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus semantics, O(log n) observe)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate from the buckets, interpolating inside the matching one"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+# (metric name, sorted label items) -> Histogram
+_histograms = {}
+
+# Multi-process mode: histograms merged over every worker, pushed down by the receiver
+_cluster = None
+
+HELP = {
+    "bot_stage_seconds": "Time spent in each stage of the conversation pipeline",
+    "ai_provider_seconds": "Duration of each AI provider attempt, by outcome"
+}
+
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    histogram.observe(value)
+
+
+@contextmanager
+def span(stage):
+    """Time a block into ``bot_stage_seconds{stage=...}``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("bot_stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+def _labels(items, extra=None):
+    items = list(items) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def snapshot(histograms=None):
+    """JSON-friendly copy of the histograms, for another process to ``merge``"""
+    histograms = _histograms if histograms is None else histograms
+    return [
+        [name, [list(item) for item in labels], histogram.counts, histogram.sum, histogram.count]
+        for (name, labels), histogram in histograms.items()
+    ]
+
+
+def merge(snapshots):
+    """Histograms summed over several ``snapshot()`` results"""
+    merged = {}
+    for entries in snapshots:
+        for name, labels, counts, total, count in entries:
+            key = (name, tuple(tuple(item) for item in labels))
+            histogram = merged.get(key)
+            if histogram is None:
+                histogram = merged[key] = Histogram()
+            histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+            histogram.sum += total
+            histogram.count += count
+    return merged
+
+
+def set_cluster(histograms):
+    """Make ``summary`` report the whole deployment instead of this process"""
+    global _cluster
+    _cluster = histograms
+
+
+def render(histograms=None):
+    """Histograms (default: this process's) in the Prometheus text exposition format"""
+    histograms = _histograms if histograms is None else histograms
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# HELP {name} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels, ('le', '+Inf'))} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary(name):
+    """[(labels, count, p50, p95, avg)] for one metric, slowest p95 first
+    (over all workers once the receiver has sent a merged snapshot)"""
+    histograms = _histograms if _cluster is None else _cluster
+    rows = []
+    for (metric, labels), histogram in histograms.items():
+        if metric != name or not histogram.count:
+            continue
+        rows.append((
+            dict(labels),
+            histogram.count,
+            histogram.quantile(0.5),
+            histogram.quantile(0.95),
+            histogram.sum / histogram.count
+        ))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
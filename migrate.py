@@ -0,0 +1,91 @@
+"""Convert per-turn conversation documents into day buckets.
+
+    python migrate.py [--batch 1000] [--delete] [--restart]
+
+Copies ``conversations`` into ``conversation_buckets`` in ``_id`` order,
+keeping each turn's original id (history reads skip duplicates). The last
+copied id is checkpointed in ``counters``, so an interrupted run resumes
+where it stopped and a second run only copies turns saved since.
+
+Suggested rollout: run it while the bot still uses
+``CONVERSATION_STORAGE=documents``, switch to ``buckets`` and restart, then
+run it once more for the turns saved in between. ``--delete`` removes
+source documents as they are copied; otherwise drop ``conversations``
+once you are happy with the result.
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from config import Config
+from conversation_store import BucketStore
+
+CHECKPOINT = "conversation_migration"
+
+
+async def migrate(db, batch_size=1000, delete=False, restart=False):
+    """Copy turns after the checkpoint into buckets; returns how many"""
+    source = db["conversations"]
+    counters = db["counters"]
+    buckets = BucketStore(db)
+    await buckets.ensure_indexes()
+
+    if restart:
+        await counters.delete_one({"_id": CHECKPOINT})
+    checkpoint = await counters.find_one({"_id": CHECKPOINT}) or {}
+    last_id = checkpoint.get("last_id")
+    copied = 0
+    started = time.monotonic()
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await source.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        ids = [turn["_id"] for turn in batch]
+        # Buckets keep their turns in time order
+        await buckets.insert(sorted(batch, key=lambda turn: turn["timestamp"]))
+        if delete:
+            await source.delete_many({"_id": {"$in": ids}})
+
+        last_id = ids[-1]
+        copied += len(batch)
+        await counters.update_one(
+            {"_id": CHECKPOINT},
+            {"$set": {"last_id": last_id, "updated": datetime.now()}, "$inc": {"copied": len(batch)}},
+            upsert=True
+        )
+        rate = copied / max(time.monotonic() - started, 1e-9)
+        print(f"📦 {copied} turns copied ({rate:.0f}/s), last {batch[-1]['timestamp']:%Y-%m-%d %H:%M}")
+
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move conversations into per-user day buckets")
+    parser.add_argument("--batch", type=int, default=1000, help="turns per read/write round")
+    parser.add_argument("--delete", action="store_true", help="delete source documents once copied")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and copy everything")
+    args = parser.parse_args()
+
+    if not Config.MONGO_URI:
+        raise SystemExit("❌ MONGO_URI not set")
+
+    async def run():
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(Config.MONGO_URI)
+        try:
+            copied = await migrate(client[Config.DATABASE_NAME], args.batch, args.delete, args.restart)
+        finally:
+            client.close()
+        print(f"✅ Migration done: {copied} turns copied")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
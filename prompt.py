@@ -0,0 +1,89 @@
+from config import Config
+
+# Rough cost of the role label / separators around each message
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for Latin/Hinglish text)"""
+    if not text:
+        return 0
+    return len(text) // 4 + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly ``max_tokens`` tokens"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def provider_budget(provider):
+    """Context budget (prompt tokens) for a provider"""
+    return {
+        "Cohere": Config.COHERE_CONTEXT_TOKENS,
+        "Hugging Face": Config.HF_CONTEXT_TOKENS
+    }.get(provider, Config.PROMPT_TOKEN_BUDGET)
+
+
+def build_messages(system_prompt, history, user_text, summary=None, budget=None):
+    """Assemble chat messages under a token budget.
+
+    ``history`` is oldest-first turns (``user_message``/``bot_response``).
+    Newest turns are kept first, each trimmed to ``PROMPT_TURN_MAX_TOKENS``,
+    up to ``PROMPT_HISTORY_TURNS`` turns or until the budget is used.
+    Returns ``(messages, dropped)`` where ``dropped`` are the older turns
+    left out of the prompt (candidates for the running summary).
+    """
+    if budget is None:
+        budget = Config.PROMPT_TOKEN_BUDGET
+
+    system = system_prompt
+    if summary:
+        system += f" What you remember about them so far: {summary}"
+
+    user_text = truncate_to_tokens(user_text, budget // 2)
+    used = estimate_tokens(system) + estimate_tokens(user_text) + 2 * MESSAGE_OVERHEAD
+
+    kept = []
+    for turn in reversed(history[-Config.PROMPT_HISTORY_TURNS:]):
+        user_message = truncate_to_tokens(turn["user_message"], Config.PROMPT_TURN_MAX_TOKENS)
+        bot_response = truncate_to_tokens(turn["bot_response"], Config.PROMPT_TURN_MAX_TOKENS)
+        cost = estimate_tokens(user_message) + estimate_tokens(bot_response) + 2 * MESSAGE_OVERHEAD
+        if used + cost > budget:
+            break
+        used += cost
+        kept.append((user_message, bot_response))
+    kept.reverse()
+
+    messages = [{"role": "system", "content": system}]
+    for user_message, bot_response in kept:
+        messages.append({"role": "user", "content": user_message})
+        messages.append({"role": "assistant", "content": bot_response})
+    messages.append({"role": "user", "content": user_text})
+
+    dropped = history[:len(history) - len(kept)]
+    return messages, dropped
+
+
+def fit_messages(messages, budget):
+    """Drop the oldest history messages until ``messages`` fit ``budget``.
+
+    The system message and the final user message are always kept.
+    """
+    def cost(msgs):
+        return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD for m in msgs)
+
+    if cost(messages) <= budget:
+        return messages
+
+    head = [m for m in messages[:1] if m.get("role") == "system"]
+    tail = messages[-1:]
+    middle = messages[len(head):-1]
+    while middle and cost(head + middle + tail) > budget:
+        middle = middle[1:]
+    # Don't start the history with a dangling assistant reply
+    if middle and middle[0].get("role") == "assistant":
+        middle = middle[1:]
+    return head + middle + tail
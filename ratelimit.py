@@ -0,0 +1,129 @@
+import asyncio
+import time
+from config import Config
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second, up to ``burst``."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.admitted = 0
+        self.throttled = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take(self, tokens):
+        now = time.monotonic()
+        if now < self.paused_until:
+            return False
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available right now (O(1), never waits)"""
+        if self._take(tokens):
+            self.admitted += 1
+            return True
+        self.throttled += 1
+        return False
+
+    def delay(self, tokens=1):
+        """Seconds until ``tokens`` could be taken"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, (tokens - self.tokens) / self.rate) if self.rate else float("inf")
+        return max(wait, self.paused_until - now)
+
+    async def acquire(self, tokens=1):
+        """Wait until tokens are available, then take them"""
+        while not self._take(tokens):
+            await asyncio.sleep(self.delay(tokens))
+        self.admitted += 1
+
+    def pause(self, seconds):
+        """Hand out no tokens for ``seconds`` (e.g. after a FloodWait)"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class UserRateLimiter:
+    """Per-user token buckets that only exist while a user is active.
+
+    ``allow`` is O(1). A bucket left idle long enough to refill completely
+    is indistinguishable from a new one, so the periodic sweep drops it and
+    memory tracks active users only.
+    """
+
+    def __init__(self, rate, burst, idle_ttl):
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = max(idle_ttl, burst / rate if rate else idle_ttl)
+        self.buckets = {}
+        self.admitted = 0
+        self.throttled = 0
+        self.expired = 0
+        self._task = None
+
+    def allow(self, user_id):
+        """Admit one message from ``user_id`` if their bucket has a token"""
+        now = time.monotonic()
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            self.buckets[user_id] = [self.burst - 1, now]
+            self.admitted += 1
+            return True
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            self.admitted += 1
+            return True
+        bucket[0] = tokens
+        self.throttled += 1
+        return False
+
+    def sweep(self):
+        """Drop buckets idle for longer than ``idle_ttl``"""
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [user_id for user_id, bucket in self.buckets.items() if bucket[1] < cutoff]
+        for user_id in idle:
+            del self.buckets[user_id]
+        self.expired += len(idle)
+        return len(idle)
+
+    def start(self, interval):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._sweep_loop(interval))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sweep_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def stats(self):
+        return {
+            "active_users": len(self.buckets),
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "expired": self.expired
+        }
+
+
+# Per-user message limiter and the global guard in front of the AI providers
+user_limiter = UserRateLimiter(Config.RATE_LIMIT_RATE, Config.RATE_LIMIT_BURST, Config.RATE_LIMIT_IDLE_TTL)
+ai_limiter = TokenBucket(Config.GLOBAL_AI_RATE, Config.GLOBAL_AI_BURST)
@@ -0,0 +1,94 @@
+import hashlib
+import random
+import re
+from datetime import datetime
+from cache import TTLCache
+from config import Config
+
+
+def _sizeof(variants):
+    return sum(len(text) for text in variants)
+
+
+class ResponseCache:
+    """Opt-in cache of AI replies for short, repeated messages.
+
+    The key is the normalized message, the system message as sent (persona
+    plus the user's memory summary, so replies written from one user's
+    memory are never served to another) and a short fingerprint of the conversation so far. Each key keeps up to
+    ``RESPONSE_CACHE_VARIANTS`` replies and a random one is served, so
+    greetings don't feel canned. While a key has fewer variants, a share of
+    lookups (``RESPONSE_CACHE_REFRESH_RATE``) still go to the provider to
+    collect more.
+    """
+
+    def __init__(self):
+        self.cache = TTLCache(
+            Config.RESPONSE_CACHE_SIZE,
+            Config.RESPONSE_CACHE_TTL,
+            maxbytes=Config.RESPONSE_CACHE_MAX_BYTES,
+            sizeof=_sizeof
+        )
+        self.refreshes = 0
+        self.stores = 0
+
+    @staticmethod
+    def normalize(text):
+        """Lowercase, drop punctuation/emoji and squeeze repeats ("hiiii" -> "hii")"""
+        text = re.sub(r"[^\w\s]", " ", text.lower())
+        text = re.sub(r"(.)\1{2,}", r"\1\1", text)
+        return " ".join(text.split())
+
+    @staticmethod
+    def fingerprint(history):
+        """'fresh' at the start of a session, else a hash of the last turn"""
+        if not history:
+            return "fresh"
+        last = history[-1]
+        timestamp = last.get("timestamp")
+        if timestamp and (datetime.now() - timestamp).total_seconds() > Config.RESPONSE_CACHE_SESSION_GAP:
+            return "fresh"
+        turn = ResponseCache.normalize(last["user_message"]) + "|" + ResponseCache.normalize(last["bot_response"])[:60]
+        return hashlib.blake2b(turn.encode(), digest_size=8).hexdigest()
+
+    def key(self, text, system, history):
+        """Cache key for a message, or None if it isn't worth caching"""
+        if not Config.RESPONSE_CACHE:
+            return None
+        normalized = self.normalize(text)
+        if not normalized or len(normalized) > Config.RESPONSE_CACHE_MAX_CHARS:
+            return None
+        system_hash = hashlib.blake2b(system.encode(), digest_size=8).hexdigest()
+        return f"{system_hash}:{self.fingerprint(history)}:{normalized}"
+
+    def get(self, key):
+        """A random cached variant, or None to call the provider"""
+        if key is None:
+            return None
+        variants = self.cache.get(key)
+        if not variants:
+            return None
+        if len(variants) < Config.RESPONSE_CACHE_VARIANTS and random.random() < Config.RESPONSE_CACHE_REFRESH_RATE:
+            self.refreshes += 1
+            return None
+        return random.choice(variants)
+
+    def put(self, key, text):
+        """Remember a provider reply as one more variant for ``key``"""
+        if key is None or not text:
+            return
+        variants = self.cache.peek(key) or []
+        if text in variants:
+            return
+        variants = (variants + [text])[-Config.RESPONSE_CACHE_VARIANTS:]
+        self.cache.set(key, variants)
+        self.stores += 1
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["refreshes"] = self.refreshes
+        stats["stores"] = self.stores
+        return stats
+
+
+response_cache = ResponseCache()
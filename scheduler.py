@@ -0,0 +1,150 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from config import Config
+
+
+class SchedulerBusy(Exception):
+    """Raised when the AI queue is full; the caller should answer "busy" right away"""
+
+
+class _Job:
+    __slots__ = ("factory", "future", "queued")
+
+    def __init__(self, factory, future):
+        self.factory = factory
+        self.future = future
+        self.queued = time.monotonic()
+
+
+class AIScheduler:
+    """Bounded worker pool in front of every AI provider call.
+
+    At most ``AI_WORKERS`` generations run at once. Waiting jobs are kept
+    per user and served round-robin, so one chatty user can't starve the
+    rest; the priority lane (owners, ``/aitest``) is always served first.
+    Once ``AI_QUEUE_MAX`` jobs are waiting, ``run`` raises ``SchedulerBusy``
+    instead of queueing work that would only time out.
+    """
+
+    def __init__(self, workers, max_depth):
+        self.workers = workers
+        self.max_depth = max_depth
+        self.priority = deque()
+        self.users = OrderedDict()  # user_id -> deque of jobs, in round-robin order
+        self.depth = 0
+        self.running = 0
+        self._ready = asyncio.Event()
+        self._tasks = []
+
+        self.started = 0
+        self.completed = 0
+        self.shed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent_waits = deque(maxlen=200)
+
+    async def run(self, user_id, factory, priority=False):
+        """Run ``factory()`` (a coroutine function) on the pool and return its result"""
+        if not self._tasks:
+            # Pool not started (scripts, tools): call straight through
+            return await factory()
+
+        if self.depth >= self.max_depth and not priority:
+            self.shed += 1
+            raise SchedulerBusy()
+
+        job = _Job(factory, asyncio.get_running_loop().create_future())
+        if priority:
+            self.priority.append(job)
+        else:
+            self.users.setdefault(user_id, deque()).append(job)
+        self.depth += 1
+        self._ready.set()
+        return await job.future
+
+    def _next_job(self):
+        if self.priority:
+            return self.priority.popleft()
+        if not self.users:
+            return None
+        # Take one job from the user at the front, then move them to the back
+        user_id, jobs = next(iter(self.users.items()))
+        job = jobs.popleft()
+        if jobs:
+            self.users.move_to_end(user_id)
+        else:
+            del self.users[user_id]
+        return job
+
+    async def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            self.depth -= 1
+            if job.future.done():
+                # Caller gave up (cancelled) while waiting
+                continue
+
+            waited = time.monotonic() - job.queued
+            self.started += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.recent_waits.append(waited)
+
+            self.running += 1
+            try:
+                result = await job.factory()
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                if not job.future.done():
+                    job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self.running -= 1
+                self.completed += 1
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Fail whatever was still waiting instead of leaving callers hanging
+        pending = list(self.priority) + [job for jobs in self.users.values() for job in jobs]
+        for job in pending:
+            if not job.future.done():
+                job.future.set_exception(SchedulerBusy())
+        self.priority.clear()
+        self.users.clear()
+        self.depth = 0
+
+    def stats(self):
+        recent = sorted(self.recent_waits)
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "waiting_users": len(self.users),
+            "completed": self.completed,
+            "shed": self.shed,
+            "avg_wait": self.wait_total / self.started if self.started else 0.0,
+            "p95_wait": recent[int(len(recent) * 0.95)] if recent else 0.0,
+            "max_wait": self.wait_max
+        }
+
+
+ai_scheduler = AIScheduler(Config.AI_WORKERS, Config.AI_QUEUE_MAX)
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from bench.fake_mongo import FakeMongoClient
+from conversation_store import BucketStore
+from migrate import migrate
+
+DAY = datetime(2024, 5, 1, 9, 0)
+
+
+def _turn(user_id, minute, text):
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "user_message": text,
+        "bot_response": f"re: {text}",
+        "timestamp": DAY + timedelta(minutes=minute)
+    }
+
+
+def test_second_migration_run_keeps_buckets_in_order():
+    async def run():
+        db = FakeMongoClient()["bot"]
+        old = [_turn(1, minute, f"old{minute}") for minute in range(5)]
+        await db["conversations"].insert_many(list(old))
+        assert await migrate(db) == 5
+
+        # Bot switched to buckets: new turns land in the same day bucket,
+        # while turns saved just before the switch are still to be copied
+        store = BucketStore(db)
+        late = [_turn(1, 10 + minute, f"late{minute}") for minute in range(3)]
+        new = [_turn(1, 40 + minute, f"new{minute}") for minute in range(3)]
+        await store.insert(new)
+        await db["conversations"].insert_many(list(late))
+        assert await migrate(db) == 3
+
+        (bucket,) = db["conversation_buckets"].docs
+        timestamps = [turn["timestamp"] for turn in bucket["turns"]]
+        assert timestamps == sorted(timestamps)
+        assert bucket["start"] == old[0]["timestamp"]
+        assert bucket["end"] == new[-1]["timestamp"]
+
+        recent = await store.recent(1, limit=3)
+        assert [turn["user_message"] for turn in recent] == ["new2", "new1", "new0"]
+        since = await store.recent(1, since=DAY + timedelta(minutes=30))
+        assert [turn["user_message"] for turn in since] == ["new2", "new1", "new0"]
+
+    asyncio.run(run())
+
+
+def test_recent_merges_overlapping_buckets():
+    async def run():
+        db = FakeMongoClient()["bot"]
+        store = BucketStore(db)
+        store.bucket_turns = 3
+        # Fills one bucket and opens a second, then older turns join the open one
+        await store.insert([_turn(1, 20 + minute, f"new{minute}") for minute in range(4)])
+        await store.insert([_turn(1, minute, f"old{minute}") for minute in range(2)])
+
+        recent = await store.recent(1, limit=4)
+        assert [turn["user_message"] for turn in recent] == ["new3", "new2", "new1", "new0"]
+
+    asyncio.run(run())
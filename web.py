@@ -0,0 +1,77 @@
+import logging
+from aiohttp import web
+from config import Config
+from database import db
+from helpers import get_available_providers
+from metrics import render as render_metrics
+
+log = logging.getLogger(__name__)
+
+
+class WebServer:
+    """Tiny HTTP server on the bot's own event loop (Render port binding + probes).
+
+    ``/health`` is liveness only: the loop is answering requests. ``/ready``
+    checks what a chat reply needs: MongoDB answers a ping, Pyrogram is
+    connected and at least one AI provider's breaker is not open.
+    ``/metrics`` exposes the latency histograms for Prometheus.
+
+    In multi-process mode the receiver swaps ``providers`` and
+    ``render_metrics`` for the workers' aggregated reports.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.runner = None
+        # Extra readiness checks: name -> callable returning bool
+        self.checks = {}
+        self.providers = get_available_providers
+        self.render_metrics = render_metrics
+
+    async def home(self, request):
+        return web.Response(text=f"✅ {Config.BOT_NAME} is running!")
+
+    async def health(self, request):
+        return web.json_response({"status": "healthy", "bot": Config.BOT_NAME})
+
+    async def ready(self, request):
+        mongo = await db.ping() if Config.MONGO_URI else False
+        telegram = bool(self.bot and self.bot.is_connected)
+        providers = self.providers()
+        checks = {name: bool(check()) for name, check in self.checks.items()}
+
+        ready = mongo and telegram and bool(providers) and all(checks.values())
+        return web.json_response(
+            {
+                "status": "ready" if ready else "not_ready",
+                "mongo": mongo,
+                "telegram": telegram,
+                "providers": providers,
+                **checks
+            },
+            status=200 if ready else 503
+        )
+
+    async def metrics(self, request):
+        return web.Response(text=self.render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def start(self, bot):
+        self.bot = bot
+        app = web.Application()
+        app.router.add_get("/", self.home)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/ready", self.ready)
+        app.router.add_get("/metrics", self.metrics)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "0.0.0.0", Config.PORT).start()
+        log.info(f"🌐 Web server on port {Config.PORT}")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+web_server = WebServer()
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from io import BytesIO
+from config import Config
+
+log = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct(">I")
+_USER_ID = struct.Struct(">q")
+
+UPDATE = b"U"
+INVALIDATE = b"I"
+STATS = b"S"
+
+
+# ========== WIRE FORMAT ==========
+# Length-prefixed frames whose first byte is the kind:
+# UPDATE holds the raw MTProto update plus the users/chats it references,
+# each as TLObject bytes; INVALIDATE holds a user_id whose cached user
+# document is stale (workers send it up, the receiver routes it to the
+# worker that owns that user); STATS holds JSON: a worker's metrics and
+# usable providers going up, the merged metrics of all workers coming down.
+
+def _frame(kind, payload):
+    return _LENGTH.pack(len(payload) + 1) + kind + payload
+
+
+def pack_update(update, users, chats):
+    parts = [_LENGTH.pack(len(users)), _LENGTH.pack(len(chats))]
+    for obj in list(users.values()) + list(chats.values()):
+        data = obj.write()
+        parts += [_LENGTH.pack(len(data)), data]
+    parts.append(update.write())
+    return _frame(UPDATE, b"".join(parts))
+
+
+def pack_invalidate(user_id):
+    return _frame(INVALIDATE, _USER_ID.pack(user_id))
+
+
+def pack_stats(data):
+    return _frame(STATS, json.dumps(data).encode())
+
+
+async def read_frame(reader):
+    """(kind, payload) of the next frame; IncompleteReadError at EOF"""
+    size = _LENGTH.unpack(await reader.readexactly(4))[0]
+    frame = await reader.readexactly(size)
+    return frame[:1], frame[1:]
+
+
+def unpack_update(payload):
+    from pyrogram.raw.core import TLObject
+
+    stream = BytesIO(payload)
+    user_count, chat_count = _LENGTH.unpack(stream.read(4))[0], _LENGTH.unpack(stream.read(4))[0]
+    objects = []
+    for _ in range(user_count + chat_count):
+        size = _LENGTH.unpack(stream.read(4))[0]
+        objects.append(TLObject.read(BytesIO(stream.read(size))))
+    users = {obj.id: obj for obj in objects[:user_count]}
+    chats = {obj.id: obj for obj in objects[user_count:]}
+    return TLObject.read(stream), users, chats
+
+
+def partition_key(update):
+    """The user an update belongs to (0 if there is none)"""
+    user_id = getattr(update, "user_id", None)
+    if user_id:
+        return user_id
+    message = getattr(update, "message", None)
+    for peer in (getattr(message, "from_id", None), getattr(message, "peer_id", None)):
+        for attr in ("user_id", "chat_id", "channel_id"):
+            value = getattr(peer, attr, None)
+            if value:
+                return value
+    return 0
+
+
+def worker_for(user_id, count):
+    # crc32 is stable across processes (hash() of ints is too, but be explicit)
+    return zlib.crc32(str(user_id).encode()) % count
+
+
+# ========== RECEIVER SIDE ==========
+
+class WorkerPool:
+    """Supervised worker processes fed over a unix socket.
+
+    The receiver's Pyrogram client keeps the Telegram connection and
+    forwards every raw update to worker ``crc32(user_id) % WORKERS``, so a
+    user's messages always reach the same process, in order, and that
+    process's caches, rate limits and coalescing stay authoritative for
+    them. Each worker has its own bounded backlog drained by its own
+    sender task, so a slow or dead worker never holds up the others; a
+    worker that exits is restarted with exponential backoff.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.socket_path = Config.WORKER_SOCKET
+        self.server = None
+        self.writers = [None] * count
+        self.backlogs = [deque(maxlen=Config.WORKER_BACKLOG) for _ in range(count)]
+        # Set when a backlog gets a frame, wakes that worker's sender
+        self.wakeups = [asyncio.Event() for _ in range(count)]
+        self.processes = [None] * count
+        self.restarts = [0] * count
+        self.forwarded = [0] * count
+        # Latest STATS report per connected worker: {"metrics": ..., "providers": [...]}
+        self.reports = [None] * count
+        self.dropped = 0
+        self._tasks = []
+        self._stopping = False
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.server = await asyncio.start_unix_server(self._on_connect, path=self.socket_path)
+        self._tasks = [asyncio.ensure_future(self._supervise(index)) for index in range(self.count)]
+        log.info(f"👷 Started {self.count} workers on {self.socket_path}")
+
+    def attach(self, client):
+        """Turn ``client`` into a pure receiver: no local handlers, no parsing"""
+        from pyrogram.handlers import RawUpdateHandler
+
+        client.dispatcher.groups.clear()
+        client.dispatcher.update_parsers = {}
+        # A single dispatcher task forwards in arrival order
+        client.workers = 1
+        client.add_handler(RawUpdateHandler(self._forward))
+
+    async def _forward(self, client, update, users, chats):
+        self._send(worker_for(partition_key(update), self.count), pack_update(update, users, chats))
+
+    def _send(self, index, frame):
+        """Queue ``frame`` for a worker; never waits on the worker itself"""
+        backlog = self.backlogs[index]
+        if len(backlog) == backlog.maxlen:
+            self.dropped += 1
+        backlog.append(frame)
+        self.wakeups[index].set()
+
+    async def _sender(self, index, writer):
+        """Write a worker's backlog to its socket, in order"""
+        backlog = self.backlogs[index]
+        wakeup = self.wakeups[index]
+        try:
+            while True:
+                while backlog:
+                    writer.write(backlog.popleft())
+                    self.forwarded[index] += 1
+                    await writer.drain()
+                wakeup.clear()
+                await wakeup.wait()
+        except ConnectionError:
+            pass
+
+    async def _on_connect(self, reader, writer):
+        index = _LENGTH.unpack(await reader.readexactly(4))[0]
+        self.writers[index] = writer
+        sender = asyncio.ensure_future(self._sender(index, writer))
+        log.info(f"👷 Worker {index} connected")
+        try:
+            # Workers send invalidations and stats reports up; EOF means the worker is gone
+            while True:
+                kind, payload = await read_frame(reader)
+                if kind == INVALIDATE:
+                    user_id = _USER_ID.unpack(payload)[0]
+                    self._send(worker_for(user_id, self.count), pack_invalidate(user_id))
+                elif kind == STATS:
+                    self.reports[index] = json.loads(payload)
+                    # Answer with the deployment-wide view for /latency
+                    writer.write(pack_stats(self.metrics_snapshot()))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            sender.cancel()
+            if self.writers[index] is writer:
+                self.writers[index] = None
+                self.reports[index] = None
+            writer.close()
+
+    async def _supervise(self, index):
+        delay = Config.WORKER_RESTART_DELAY
+        while not self._stopping:
+            started = time.monotonic()
+            process = self.processes[index] = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), str(index), str(self.count),
+                cwd=os.path.dirname(os.path.abspath(__file__))
+            )
+            code = await process.wait()
+            if self._stopping:
+                return
+
+            # Back off on crash loops, reset once a worker has stayed up a while
+            if time.monotonic() - started > 60:
+                delay = Config.WORKER_RESTART_DELAY
+            log.error(f"💥 Worker {index} exited with {code}, restarting in {delay:.0f}s")
+            self.restarts[index] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def metrics_snapshot(self):
+        """All reporting workers' histograms merged, in ``metrics.snapshot`` form"""
+        from metrics import merge, snapshot
+
+        return snapshot(merge(report["metrics"] for report in self.reports if report))
+
+    def render_metrics(self):
+        """/metrics for the deployment (the receiver itself answers no chats)"""
+        from metrics import merge, render
+
+        return render(merge(report["metrics"] for report in self.reports if report))
+
+    def available_providers(self):
+        """Providers usable in at least one worker, per their last reports"""
+        providers = []
+        for report in self.reports:
+            for name in (report or {}).get("providers", []):
+                if name not in providers:
+                    providers.append(name)
+        return providers
+
+    def healthy(self):
+        return all(writer is not None for writer in self.writers)
+
+    async def stop(self):
+        self._stopping = True
+        for process in self.processes:
+            if process and process.returncode is None:
+                process.terminate()
+        for process in self.processes:
+            if process:
+                try:
+                    await asyncio.wait_for(process.wait(), 15)
+                except asyncio.TimeoutError:
+                    process.kill()
+        for task in self._tasks:
+            task.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def stats(self):
+        return [
+            {
+                "index": index,
+                "pid": process.pid if process else None,
+                "connected": self.writers[index] is not None,
+                "forwarded": self.forwarded[index],
+                "backlog": len(self.backlogs[index]),
+                "restarts": self.restarts[index]
+            }
+            for index, process in enumerate(self.processes)
+        ]
+
+
+worker_pool = WorkerPool(Config.WORKERS) if Config.WORKERS else None
+
+
+# ========== WORKER SIDE ==========
+
+def _start_handler_tasks(client):
+    """Run the dispatcher's handler workers although the client has no_updates"""
+    dispatcher = client.dispatcher
+    for _ in range(client.workers):
+        lock = asyncio.Lock()
+        dispatcher.locks_list.append(lock)
+        dispatcher.handler_worker_tasks.append(asyncio.ensure_future(dispatcher.handler_worker(lock)))
+
+
+async def _stop_handler_tasks(client):
+    dispatcher = client.dispatcher
+    for _ in dispatcher.handler_worker_tasks:
+        dispatcher.updates_queue.put_nowait(None)
+    await asyncio.gather(*dispatcher.handler_worker_tasks, return_exceptions=True)
+    dispatcher.handler_worker_tasks.clear()
+
+
+async def _receive(client, index):
+    """Feed updates from the receiver into the local dispatcher until it goes away"""
+    for _ in range(30):
+        try:
+            reader, writer = await asyncio.open_unix_connection(Config.WORKER_SOCKET)
+            break
+        except OSError:
+            await asyncio.sleep(1)
+    else:
+        raise RuntimeError(f"Receiver socket {Config.WORKER_SOCKET} not available")
+
+    writer.write(_LENGTH.pack(index))
+    await writer.drain()
+
+    from database import db
+
+    # Bans and blocks written here must reach the worker caching that user
+    def publish(user_id):
+        writer.write(pack_invalidate(user_id))
+
+    db.on_user_changed = publish
+    report = asyncio.ensure_future(_report(writer))
+    try:
+        while True:
+            kind, payload = await read_frame(reader)
+            if kind == INVALIDATE:
+                db.user_cache.pop(_USER_ID.unpack(payload)[0])
+                continue
+            if kind == STATS:
+                from metrics import merge, set_cluster
+
+                set_cluster(merge([json.loads(payload)]))
+                continue
+            update, users, chats = unpack_update(payload)
+            # Same as Client.handle_updates: learn access hashes before handlers reply
+            await client.fetch_peers(list(users.values()))
+            await client.fetch_peers(list(chats.values()))
+            client.dispatcher.updates_queue.put_nowait((update, users, chats))
+    except asyncio.IncompleteReadError:
+        log.warning(f"👷 Worker {index}: receiver closed the connection")
+    finally:
+        report.cancel()
+        db.on_user_changed = None
+        writer.close()
+
+
+async def _report(writer):
+    """Send this worker's metrics and provider availability to the receiver"""
+    from helpers import get_available_providers
+    from metrics import snapshot
+
+    while True:
+        writer.write(pack_stats({"metrics": snapshot(), "providers": get_available_providers()}))
+        await asyncio.sleep(Config.WORKER_STATS_INTERVAL)
+
+
+async def _serve(app, index):
+    from pyrogram import idle
+
+    await app.start_services(primary=index == 0)
+    _start_handler_tasks(app.bot)
+    log.info(f"👷 Worker {index} ready (pid {os.getpid()})")
+
+    receive = asyncio.ensure_future(_receive(app.bot, index))
+    wait_idle = asyncio.ensure_future(idle())
+    try:
+        await asyncio.wait([receive, wait_idle], return_when=asyncio.FIRST_COMPLETED)
+        if receive.done() and not receive.cancelled() and receive.exception():
+            log.error(f"👷 Worker {index} lost the receiver: {receive.exception()}")
+    finally:
+        for task in (receive, wait_idle):
+            task.cancel()
+        await _stop_handler_tasks(app.bot)
+        await app.stop_services()
+
+
+def run_worker(index, count):
+    from pyrogram.storage import FileStorage
+    from log_config import setup_logging, stop_logging
+    from ratelimit import ai_limiter
+    from scheduler import ai_scheduler
+
+    setup_logging()
+    import bot as app
+
+    app.worker_index = index
+
+    # Own session file, so restarts skip the (flood-limited) bot login and
+    # keep the peer cache; updates come from the receiver, not Telegram
+    client = app.bot
+    client.name = f"{client.name}-worker{index}"
+    client.storage = FileStorage(client.name, client.workdir)
+    client.no_updates = True
+
+    # Deployment-wide AI budgets are split between the workers
+    ai_limiter.rate /= count
+    ai_limiter.burst = max(1, ai_limiter.burst // count)
+    ai_limiter.tokens = min(ai_limiter.tokens, ai_limiter.burst)
+    ai_scheduler.workers = max(1, ai_scheduler.workers // count)
+
+    try:
+        client.run(_serve(app, index))
+    finally:
+        stop_logging()
+
+
+if __name__ == "__main__":
+    run_worker(int(sys.argv[1]), int(sys.argv[2]))